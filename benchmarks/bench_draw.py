@@ -0,0 +1,67 @@
+''' Per-refresh draw time of the forecast charts with each drawing backend.
+On the PyPortal: copy drawing.py, chart.py and this folder to CIRCUITPY and run `import benchmarks.bench_draw` from the REPL.
+On a computer: python3 -m benchmarks.bench_draw from the repository, with the stand-ins of host/lib.
+'''
+
+import time
+import random
+try:
+    import displayio
+except ImportError: # not on a board
+    import host
+    host.install()
+    import displayio
+import drawing
+import chart
+
+WIDTH = 320
+HEIGHT = 240
+Forecast_nb = 19
+CHARTS = ((180, 48, 1), (180, 96, 49), (180, 144, 97), (180, 192, 145), (180, 239, 193)) # (x_min, y_max, y_min)
+rounds = 3
+
+
+def refresh(canvas, heights): # one forecast refresh: 5 bar charts, the day lines and the update bar
+    bar_width = int((WIDTH - 1 - 180) / Forecast_nb)
+    for metric, (x_min, y_max, y_min) in enumerate(CHARTS):
+        canvas.clear_region(metric, x_min, WIDTH - 1, y_min, y_max)
+        for slot in range(Forecast_nb - 1):
+            x0 = x_min + slot * bar_width + 1
+            y_top = y_max - heights[metric][slot] * (y_max - y_min) // 100
+            canvas.draw_bar(metric, slot, x0, x0 + bar_width - 1, y_top, y_max, 1 + metric)
+    lines = {}
+    for slot in range(0, Forecast_nb - 1, 4):
+        lines[180 + (1 + slot) * bar_width] = (2, HEIGHT, 5, 1) if slot % 8 else (5, HEIGHT, 2, 5)
+    canvas.draw_vlines(lines)
+    drawing.hline(canvas.bitmap, 0, WIDTH // 2, 1, 1)
+    drawing.hline(canvas.bitmap, WIDTH // 2, WIDTH, 1, 0)
+
+
+def random_heights():
+    return [[random.randint(0, 100) for _ in range(Forecast_nb - 1)] for _ in CHARTS]
+
+
+def run():
+    print('-'*40)
+    print('Draw benchmark, ', rounds, ' rounds per backend')
+    print('-'*40, '\n')
+    for name in drawing.BACKENDS:
+        drawing.use_backend(name)
+        full = 0
+        partial = 0
+        for _ in range(rounds):
+            canvas = chart.ChartCanvas(displayio.Bitmap(WIDTH, HEIGHT, 8))
+            heights = random_heights()
+            start = time.monotonic()
+            refresh(canvas, heights) # first draw of every bar
+            full += time.monotonic() - start
+            heights[0] = random_heights()[0] # one metric changes
+            start = time.monotonic()
+            refresh(canvas, heights)
+            partial += time.monotonic() - start
+        print('{:12s} full refresh: {:7.1f} ms | one chart changed: {:7.1f} ms'.format(
+            name, 1000 * full / rounds, 1000 * partial / rounds))
+    drawing.use_backend(drawing.BACKENDS[0])
+
+
+run()
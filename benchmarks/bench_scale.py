@@ -0,0 +1,67 @@
+''' Bar height mapping: simpleio.map_range against chart.ChartScale (table and integer math), for the scales the
+station builds from chart.STATION_LAYOUT.
+On the PyPortal: copy chart.py, drawing.py, forecast.py and this folder to CIRCUITPY and run `import benchmarks.bench_scale` from the REPL.
+On a computer: python3 -m benchmarks.bench_scale from the repository, with the stand-ins of host/lib.
+'''
+
+import time
+try:
+    import simpleio
+except ImportError: # not on a board
+    import host
+    host.install()
+    import simpleio
+import chart
+from forecast import METRICS
+
+WIDTH = 320
+HEIGHT = 240
+Forecast_nb = 19
+rounds = 2000
+
+
+def run():
+    print('-'*40)
+    print('Scale benchmark, ', rounds, ' values per chart')
+    print('-'*40, '\n')
+    (x, y) = chart.layout_origin(chart.STATION_LAYOUT)
+    layout = chart.ChartLayout(chart.STATION_LAYOUT, METRICS, Forecast_nb, Forecast_nb - 1, WIDTH - x, HEIGHT - y, (x, y))
+    for (entry, bar_chart) in zip(chart.STATION_LAYOUT, layout.charts):
+        (metric, (value_min, value_max)) = (entry[0], entry[3])
+        (y_top, y_bottom) = (bar_chart.y_top, bar_chart.y_bottom)
+        scale = METRICS[metric][1]
+        low = round(value_min * scale)
+        span = round(value_max * scale) - low
+        raws = [low - span // 10 + (i * 7919) % (span + span // 5 + 1) for i in range(rounds)] # values over and out of the range
+        values = [raw / scale for raw in raws]
+
+        start = time.monotonic()
+        for value in values:
+            int(simpleio.map_range(value, value_min, value_max, y_bottom, y_top))
+        float_time = time.monotonic() - start
+
+        table = bar_chart.scale # the one draw_bar_chart() uses
+        start = time.monotonic()
+        for raw in raws:
+            table.map(raw)
+        table_time = time.monotonic() - start
+
+        computed = chart.ChartScale(value_min, value_max, scale, y_top, y_bottom)
+        computed._table = None # force the integer math path
+        start = time.monotonic()
+        for raw in raws:
+            computed.map(raw)
+        compute_time = time.monotonic() - start
+
+        mismatches = 0
+        clipped = 0
+        for i in range(rounds):
+            (row, out) = table.map(raws[i])
+            clipped += out
+            if row != int(simpleio.map_range(values[i], value_min, value_max, y_bottom, y_top)):
+                mismatches += 1 # float rounding of map_range at a row boundary
+        print('{:9s} map_range: {:6.1f} ms | table{}: {:6.1f} ms | integer: {:6.1f} ms | clipped: {} | rows differing: {}'.format(
+            metric, 1000 * float_time, '' if table._table is not None else ' (none)', 1000 * table_time, 1000 * compute_time, clipped, mismatches))
+
+
+run()
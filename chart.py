@@ -0,0 +1,139 @@
+''' Incremental bar chart renderer for the forecast charts.
+Remembers the height and color of every bar it drew on a bitmap and only repaints the pixels that changed.
+'''
+
+import array
+import drawing
+
+TABLE_MAX = 256 # value ranges up to this many steps are mapped with a precomputed table
+
+# forecast charts of the station (CHART_LAYOUT of code_v3.py), top to bottom, see ChartLayout. Kept here so the
+# benchmarks build the same scales. Row 1 is the update bar, night slots of the sun chart are grey and at least 2 pixels high
+STATION_LAYOUT = (
+    ('sun', (180, 48), (319, 2), (0, 100), 2, 5, 2), # SUN/CLOUDS %
+    ('temp', (180, 96), (319, 49), (0, 30), 6, None, 0), # TEMP Celsius
+    ('humidity', (180, 144), (319, 97), (30, 100), 4, None, 0), # HUMIDITY %
+    ('rain', (180, 192), (319, 145), (0, 5), 1, None, 0), # RAIN mm
+    ('wind', (180, 239), (319, 193), (0, 30), 5, None, 0), # WIND km/h
+)
+
+
+def layout_origin(layout): # (x, y) top left corner of the charts of a layout table, on the screen
+    return (min(entry[1][0] for entry in layout), min(entry[2][1] for entry in layout))
+
+
+class ChartCanvas:
+    ''' Bars drawn on bitmap, keyed by (metric, slot). Bars grow from y_bottom (excluded) up to y_top (included). '''
+
+    def __init__(self, bitmap, background=0):
+        self.bitmap = bitmap
+        self.background = background
+        self.pixels_written = 0 # total since creation, compare before/after a refresh to get the cost of it
+        self._bars = {} # (metric, slot) -> (x0, x1, y_top, y_bottom, color) as last drawn
+        self._regions = set() # metrics whose rectangle was blanked once
+        self._lines = {} # x -> (y0, y1, color, step) of vertical lines last drawn
+
+    def _fill(self, x0, x1, y0, y1, color): # fill [x0, x1) x [y0, y1)
+        self.pixels_written += drawing.fill_rect(self.bitmap, x0, y0, x1, y1, color)
+
+    def clear_region(self, metric, x0, x1, y0, y1): # blank a chart rectangle the first time the metric is drawn
+        if metric in self._regions:
+            return
+        self._fill(x0, x1, y0, y1, self.background)
+        self._regions.add(metric)
+
+    def draw_bar(self, metric, slot, x0, x1, y_top, y_bottom, color): # draw or update one bar, touching only what changed
+        key = (metric, slot)
+        new = (x0, x1, y_top, y_bottom, color)
+        old = self._bars.get(key)
+        if old == new:
+            return
+        self._bars[key] = new
+        if old is None or old[0] != x0 or old[1] != x1 or old[3] != y_bottom:
+            if old is not None: # geometry changed, erase the old bar completely
+                self._fill(old[0], old[1], old[2], old[3], self.background)
+            self._fill(x0, x1, y_top, y_bottom, color)
+            return
+        old_top = old[2]
+        if old[4] != color: # recolor the part that stays, then grow or shrink
+            self._fill(x0, x1, max(y_top, old_top), y_bottom, color)
+            if y_top < old_top:
+                self._fill(x0, x1, y_top, old_top, color)
+        elif y_top < old_top: # grow
+            self._fill(x0, x1, y_top, old_top, color)
+        if y_top > old_top: # shrink
+            self._fill(x0, x1, old_top, y_top, self.background)
+
+    def draw_vlines(self, lines): # lines: {x: (y0, y1, color, step)}, replaces the vertical lines drawn previously
+        for x, old in self._lines.items():
+            if lines.get(x) != old:
+                self.pixels_written += drawing.vline(self.bitmap, x, old[0], old[1], self.background)
+        for x, line in lines.items():
+            if self._lines.get(x) == line:
+                continue
+            (y0, y1, color, step) = line
+            self.pixels_written += drawing.dotted_vline(self.bitmap, x, y0, y1, color, step)
+        self._lines = lines
+
+
+class ChartScale:
+    ''' Maps scaled integer values (see forecast.METRICS) to the bitmap row of the top of their bar, integer math only.
+    value_min is drawn at y_bottom, value_max at y_top, values outside are clamped and reported as clipped. '''
+
+    def __init__(self, value_min, value_max, scale, y_top, y_bottom):
+        self.low = round(value_min * scale)
+        self.high = round(value_max * scale)
+        self.y_top = y_top
+        self.y_bottom = y_bottom
+        self._span = self.high - self.low
+        self._height = y_bottom - y_top
+        self._table = None
+        if self._span <= TABLE_MAX:
+            self._table = array.array('H', [self._compute(raw) for raw in range(self.low, self.high + 1)])
+
+    def _compute(self, raw): # same rows as int(simpleio.map_range(value, min, max, y_bottom, y_top))
+        return self.y_bottom - ((raw - self.low) * self._height + self._span - 1) // self._span
+
+    def map(self, raw): # (row, clipped)
+        if raw <= self.low:
+            return self.y_bottom, raw < self.low
+        if raw >= self.high:
+            return self.y_top, raw > self.high
+        if self._table is not None:
+            return self._table[raw - self.low], False
+        return self._compute(raw), False
+
+
+class BarChart:
+    ''' One chart of a ChartLayout, every coordinate is computed once. '''
+    __slots__ = ('metric', 'scale', 'color', 'night_color', 'x_min', 'x_max', 'y_top', 'y_bottom', 'floor', 'x0', 'x1')
+
+
+class ChartLayout:
+    ''' Geometry of the forecast charts from a layout table, built once at startup.
+    Each entry is (metric, bottom_left, top_right, (value_min, value_max), color, night_color, min_height):
+    night_color (or None) is used for slots flagged as night, bars are at least min_height pixels high.
+    metrics gives the scale of the stored integers (see forecast.METRICS). The width of the chart is split in
+    columns bars, slots of them are drawn. The day lines sit on the right edge of each bar of the first chart.
+    Layout points are screen coordinates, origin is where the width x height bitmap of the charts sits on the screen.
+    '''
+
+    def __init__(self, layout, metrics, columns, slots, width, height, origin=(0, 0)):
+        self.charts = []
+        (x_origin, y_origin) = origin
+        for (metric, bottom_left, top_right, (value_min, value_max), color, night_color, min_height) in layout:
+            chart = BarChart()
+            chart.metric = metric
+            chart.color = color
+            chart.night_color = night_color
+            chart.x_min = bottom_left[0] - x_origin
+            chart.x_max = top_right[0] - x_origin
+            chart.y_top = max(0, top_right[1] - y_origin)
+            chart.y_bottom = min(height - 1, bottom_left[1] - y_origin)
+            chart.floor = chart.y_bottom - min_height # lowest row of the top of a bar
+            chart.scale = ChartScale(value_min, value_max, metrics[metric][1], chart.y_top, chart.y_bottom)
+            bar_width = (chart.x_max - chart.x_min) // columns
+            chart.x0 = array.array('H', [max(0, chart.x_min + slot * bar_width + 1) for slot in range(slots)])
+            chart.x1 = array.array('H', [min(width - 1, chart.x_min + (1 + slot) * bar_width) for slot in range(slots)])
+            self.charts.append(chart)
+        self.line_x = self.charts[0].x1 if self.charts else array.array('H')
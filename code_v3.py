@@ -10,12 +10,41 @@ import busio
 import time
 import rtc
 import gc
+import sys
 from digitalio import DigitalInOut
 from adafruit_esp32spi import adafruit_esp32spi
 import adafruit_esp32spi.adafruit_esp32spi_socket as socket
 import adafruit_requests as requests
 from adafruit_display_text import label
-from adafruit_bitmap_font import bitmap_font
+import glyph_font
+import owm_stream
+import chart
+from forecast import METRICS, DAY, MIDNIGHT, NOON
+import drawing
+from scheduler import Scheduler
+from retry import RetryBudget, RetryPolicy
+from http_cache import ResponseCache
+from http_session import KeepAliveSession
+from timesource import TimeKeeper, HeaderTimeSource, NtpTimeSource, AdafruitIOTimeSource
+from profiler import Profiler
+from gc_policy import GcPolicy
+from snapshot import Snapshot
+from history import History
+from location import Location
+from display_refresh import DisplayRefresh
+
+try:
+    from micropython import const
+except ImportError: # CPython, see host/
+    def const(value):
+        return value
+
+try:
+    import supervisor
+except ImportError:
+    supervisor = None
+
+boot_start = time.monotonic() # time to the first frame is counted from here
 
 try:
     from secrets import secrets
@@ -28,33 +57,71 @@ except ImportError:
 # SETTINGS                                  #
 #############################################
 
-WEATHER_LOCATION = 1850147 # 1850147 = Tokyo, 5128581 = NY, 2988507 = Paris
-TZ_offset = 9 # Time difference between WEATHER_LOCATION and GMT. TOKYO = 9
-
-sun_min = 0     # %
-sun_max = 100   # %
-temp_min = 0    # Celsius
-temp_max = 30   # Celsius
-hum_min = 30    # %
-hum_max = 100   # %
-rain_min = 0    # mm
-rain_max = 5    # mm
-wind_min = 0    # km/h
-wind_max = 30   # km/h
+# (name, city id, latitude, longitude, time difference with GMT in hours). The coordinates are used by COMBINED_FETCH,
+# the time difference is replaced by the offset the weather API returns. The RTC keeps the time of the first location
+LOCATIONS = (
+    ('Tokyo', 1850147, 35.6895, 139.6917, 9),
+    # ('New York', 5128581, 40.7143, -74.006, -5),
+    # ('Paris', 2988507, 48.8534, 2.3488, 1),
+)
+location_freq = 20 # number of seconds each location is displayed, when there are several
+COMBINED_FETCH = False # True: CURRENT weather and FORECASTS from a single One Call request (hourly data, 16 slots of 3 hours)
 
 Forecast_nb = 19 # 16 * 3 hours = 2 days
-update_freq = 5 # number of seconds between update cycle in infinite loop
-displayed_time_update_freq = 60 # number of seconds between displayed time update
-weather_update_freq = 300 # number of seconds between weather (and internet time) API requests
 
-attempts = 10  # Number of attempts to retry each request before raising error
-error_delay = 10 # Number of seconds to wait before retrying after error
+# forecast charts, top to bottom: (metric, bottom left, top right, (min, max), palette color, night color, minimum bar height)
+# the table is chart.STATION_LAYOUT, shared with the benchmarks. A table of the same format here changes the charts
+CHART_LAYOUT = chart.STATION_LAYOUT
+update_freq = 5 # number of seconds between update bar, brightness and memory clearing
+displayed_time_update_freq = 60 # number of seconds between displayed time update, aligned on the minute
+weather_update_freq = 300 # number of seconds between weather (and internet time) API requests
+scheduler_report_freq = 300 # number of seconds between task statistics printouts
+
+request_gap = 1 # number of seconds a network task waits when another one sent a request in the same loop pass
+attempts = 10  # Number of retries all requests can spend in a burst (shared retry budget)
+attempts_refill = 60 # Number of seconds for one spent retry to come back into the budget
+error_delay = 10 # Number of seconds before the first retry after an error, doubled after each new failure
+max_error_delay = 120 # Maximum number of seconds between retries
+gc_threshold = 16384 # bytes allocated between automatic background collections, explicit ones run around downloads and redraws
+gc_idle_threshold = 4096 # bytes allocated since the last collection before the periodic memory clearing collects again
+SNAPSHOT_FILE = '/sd/laststate{}.bin' # last known CURRENT weather, FORECASTS and TIME, shown at boot while WIFI connects. {} = index in LOCATIONS
+snapshot_freq = 900 # number of seconds between writes of SNAPSHOT_FILE at most, to spare the SD card
+HISTORY_FILE = '/sd/history{}.bin' # every CURRENT weather observation, oldest overwritten once full. {} = index in LOCATIONS
+history_size = 2016 # observations kept in HISTORY_FILE, 1 week of weather_update_freq
+history_batch = 4 # observations kept in RAM between writes of HISTORY_FILE
+max_fps = 2 # display refreshes per second at most, None for no limit. The display is only refreshed when something on it changed
+PROFILE = const(1) # per-phase time and memory profile, printed by typing p then Enter on the serial console. 0 compiles the hooks out
 
 cwd = ('/'+__file__).rsplit('/', 1)[0]  # the current working directory (where this file is)
 
-small_font = bitmap_font.load_font(cwd+'/fonts/mono-bold-8.bdf')
-large_font = bitmap_font.load_font(cwd+'/fonts/Arial-Bold-24.bdf')
+# fonts/*.glf made by tools/bdf2glyphs.py when present, the BDF otherwise. All glyphs are loaded now, not at the first update
+gc.collect()
+font_alloc = gc.mem_alloc()
+font_start = time.monotonic()
+small_font = glyph_font.load_font(cwd+'/fonts/mono-bold-8', glyph_font.STATION_CHARACTERS + ''.join(entry[0] for entry in LOCATIONS))
+large_font = glyph_font.load_font(cwd+'/fonts/Arial-Bold-24')
+gc.collect()
+print('FONTS loaded in {:.2f}s, RAM used: {:,} bytes'.format(time.monotonic() - font_start, gc.mem_alloc() - font_alloc))
 text_color = 0xffffff
+stale_text_color = 0x858585 # GREY, last known values shown while updates fail
+
+# profiled phases, the ids index PHASES. One draw phase per CHART_LAYOUT entry, from P_DRAW on
+P_WIFI = const(0)
+P_HTTP_CURRENT = const(1)
+P_HTTP_FORECAST = const(2)
+P_HTTP_WEATHER = const(3)
+P_PARSE_CURRENT = const(4) # the body is read from the socket while it is parsed
+P_PARSE_FORECAST = const(5)
+P_PARSE_WEATHER = const(6)
+P_TIME = const(7)
+P_LABEL = const(8)
+P_REFRESH = const(9)
+P_DAY_LINE = const(10)
+P_DRAW = const(11)
+PHASES = ('wifi', 'http current', 'http forecast', 'http weather', 'parse current', 'parse forecast', 'parse weather',
+    'time', 'label', 'refresh', 'day lines') + tuple('draw ' + layout[0] for layout in CHART_LAYOUT)
+profiler = Profiler(PHASES)
+gc_policy = GcPolicy(gc_threshold, gc_idle_threshold)
 
 esp32_cs = DigitalInOut(board.ESP_CS)
 esp32_ready = DigitalInOut(board.ESP_BUSY)
@@ -63,29 +130,6 @@ spi = busio.SPI(board.SCK, board.MOSI, board.MISO)
 esp = adafruit_esp32spi.ESP_SPIcontrol(spi, esp32_cs, esp32_ready, esp32_reset)
 
 
-#############################################
-# CONNECT TO WIFI                           #
-#############################################
-print('-'*40)
-print('Connecting to WIFI...')
-print('-'*40, '\n')
-
-def connect_to_wifi():
-    while not esp.is_connected:
-        try:
-            time.sleep(1)
-            esp.connect_AP(secrets['ssid'], secrets['password'])
-        except RuntimeError as e:
-            print('Could not connect to WIFI, retrying: ', e)
-            continue
-    print('Connected to', str(esp.ssid, 'utf-8'), '\tRSSI:', esp.rssi, '   IP address is', esp.pretty_ip(esp.ip_address), '\n')
-connect_to_wifi()
-if esp.status == adafruit_esp32spi.WL_IDLE_STATUS:
-    print('\nPYPORTAL found and in idle mode')
-
-requests.set_socket(socket, esp)
-
-
 #############################################
 # CREATE DISPLAY SETUP                      #
 #############################################
@@ -99,10 +143,10 @@ light = analogio.AnalogIn(board.LIGHT)
 board.DISPLAY.brightness = 1
 HEIGHT = display.height
 WIDTH = display.width
-group = displayio.Group(max_size=10)
+group = displayio.Group(max_size=7 + len(CHART_LAYOUT)) # the layers below
 
-##### BAR CHART LAYER ##### 0
-BC_bitmap = displayio.Bitmap(WIDTH, HEIGHT, 8)
+##### UPDATE BAR LAYER ##### 0
+UB_bitmap = displayio.Bitmap(WIDTH, 2, 9) # rows above the forecast charts, blue or red (8)
 palette = displayio.Palette(9)
 palette[0] = 0x000000  # BLACK
 palette[1] = 0x0000ff  # BLUE RAIN
@@ -112,64 +156,78 @@ palette[5] = 0x858585  # GREY WIND
 palette[6] = 0xFC538A  # ROSE TEMP
 palette[7] = 0xffffff  # WHITE
 palette[8] = 0xFF0000  # ROUGE
-BC_tile_grid = displayio.TileGrid(BC_bitmap, pixel_shader=palette)
-
-group.append(BC_tile_grid)
+UB_tile_grid = displayio.TileGrid(UB_bitmap, pixel_shader=palette)
+group.append(UB_tile_grid)
 
 ##### TEMPERATURE LAYER ##### 1
 text_temp = ' '
-TEMP_text_area = label.Label(large_font, text=text_temp, color=text_color)
+TEMP_text_area = label.Label(large_font, text=text_temp, color=text_color, max_glyphs=8) # created once, text changed in place
+TEMP_text_area.x = 24
+TEMP_text_area.y = 75
 group.append(TEMP_text_area)
 
 ##### HUMIDITY LAYER ##### 2
 text_hum = ' '
-HUM_text_area = label.Label(large_font, text=text_hum, color=text_color)
+HUM_text_area = label.Label(large_font, text=text_hum, color=text_color, max_glyphs=5)
+HUM_text_area.x = 40
+HUM_text_area.y = 125
 group.append(HUM_text_area)
 
 ##### WIND LAYER ##### 3
 text_wind = ' '
-WIND_text_area = label.Label(large_font, text=text_wind, color=text_color)
+WIND_text_area = label.Label(large_font, text=text_wind, color=text_color, max_glyphs=8)
+WIND_text_area.x = 22
+WIND_text_area.y = 220
 group.append(WIND_text_area)
 
 ##### TIME LAYER ##### 4
 text_time = ' '
-TIME_text_area = label.Label(large_font, text=text_time, color=text_color)
+TIME_text_area = label.Label(large_font, text=text_time, color=text_color, max_glyphs=5)
+TIME_text_area.x = 28
+TIME_text_area.y = 30
 group.append(TIME_text_area)
 
-##### SUN SCALE LAYER ##### 5
-text_sun_scale = str(sun_max) + '\n' + str(sun_min)
-SUN_SCALE_text_area = label.Label(small_font, text=text_sun_scale, color=text_color)
-SUN_SCALE_text_area.x = 150
-SUN_SCALE_text_area.y = 29
-group.append(SUN_SCALE_text_area)
-
-##### TEMP SCALE LAYER ##### 6
-text_temp_scale = str(temp_max) + '\n' + str(temp_min)
-TEMP_SCALE_text_area = label.Label(small_font, text=text_temp_scale, color=text_color)
-TEMP_SCALE_text_area.x = 150
-TEMP_SCALE_text_area.y = 75
-group.append(TEMP_SCALE_text_area)
-
-##### HUMIDITY SCALE LAYER ##### 7
-text_hum_scale = str(hum_max) + '\n' + str(hum_min)
-HUM_SCALE_text_area = label.Label(small_font, text=text_hum_scale, color=text_color)
-HUM_SCALE_text_area.x = 150
-HUM_SCALE_text_area.y = 124
-group.append(HUM_SCALE_text_area)
-
-##### RAIN SCALE LAYER ##### 8
-text_rain_scale = str(rain_max) + '\n' + str(rain_min)
-RAIN_SCALE_text_area = label.Label(small_font, text=text_rain_scale, color=text_color)
-RAIN_SCALE_text_area.x = 150
-RAIN_SCALE_text_area.y = 173
-group.append(RAIN_SCALE_text_area)
-
-##### WIND SCALE LAYER ##### 9
-text_wind_scale = str(wind_max) + '\n' + str(wind_min)
-WIND_SCALE_text_area = label.Label(small_font, text=text_wind_scale, color=text_color)
-WIND_SCALE_text_area.x = 150
-WIND_SCALE_text_area.y = 219
-group.append(WIND_SCALE_text_area)
+##### SCALE LAYERS ##### 5 to 4 + len(CHART_LAYOUT)
+# max and min of every chart, left of its rectangle and centered on it, one layer per CHART_LAYOUT entry
+for (metric, bottom_left, top_right, (value_min, value_max), color, night_color, min_height) in CHART_LAYOUT:
+    scale_text_area = label.Label(small_font, text=str(value_max) + '\n' + str(value_min), color=text_color)
+    scale_text_area.x = bottom_left[0] - 30
+    scale_text_area.y = (bottom_left[1] + top_right[1]) // 2 + 4
+    group.append(scale_text_area)
+
+##### FORECAST CHARTS LAYER ##### CHART_LAYER
+# one bitmap per location plus one spare, only the screen area of CHART_LAYOUT: the front one of the shown location is on
+# screen while a refresh draws the spare. A forecast refresh or showing another location swaps this layer
+(CHART_X, CHART_Y) = chart.layout_origin(CHART_LAYOUT)
+# bar x spans, day line columns and value scales of CHART_LAYOUT, computed once
+chart_layout = chart.ChartLayout(CHART_LAYOUT, METRICS, Forecast_nb, Forecast_nb - 1, WIDTH - CHART_X, HEIGHT - CHART_Y, (CHART_X, CHART_Y))
+
+# FORECASTS of each location, one column of scaled integers per metric. Refreshes fill the spare and swap, both are reused forever
+locations = []
+for (name, city_id, lat, lon, tz_offset) in LOCATIONS:
+    location = Location(len(locations), name, city_id, lat, lon, tz_offset, Forecast_nb - 1)
+    location.bitmap = displayio.Bitmap(WIDTH - CHART_X, HEIGHT - CHART_Y, 8)
+    location.canvas = chart.ChartCanvas(location.bitmap) # remembers drawn bars so a refresh only repaints what changed
+    location.tile_grid = displayio.TileGrid(location.bitmap, pixel_shader=palette, x=CHART_X, y=CHART_Y)
+    locations.append(location)
+spare_bitmap = displayio.Bitmap(WIDTH - CHART_X, HEIGHT - CHART_Y, 8)
+# (bitmap, canvas, tile_grid) drawn by the next refresh of any location, its canvas diffs against whatever it drew last
+spare_charts = (spare_bitmap, chart.ChartCanvas(spare_bitmap), displayio.TileGrid(spare_bitmap, pixel_shader=palette, x=CHART_X, y=CHART_Y))
+spare_bitmap = None
+home = locations[0] # the RTC keeps its local time
+shown = home # location on screen
+CHART_LAYER = len(group)
+group.append(shown.tile_grid)
+
+##### LOCATION LAYER ##### CHART_LAYER + 1
+LOCATION_text_area = label.Label(small_font, text=' ', color=text_color, max_glyphs=max(len(entry[0]) for entry in LOCATIONS))
+LOCATION_text_area.x = 24
+LOCATION_text_area.y = 170
+group.append(LOCATION_text_area)
+
+# one name per layer above, in the group order. Code that changes a layer marks it, the main loop refreshes the marked ones
+LAYERS = ('update bar', 'temperature', 'humidity', 'wind', 'time') + tuple(layout[0] + ' scale' for layout in CHART_LAYOUT) + ('charts', 'location')
+display_refresh = DisplayRefresh(display, LAYERS, max_fps)
 
 print('DISPLAY created succesfully\n')
 
@@ -178,63 +236,100 @@ print('DISPLAY created succesfully\n')
 # FUNCTIONS                                 #
 #############################################
 
-def TZ(mytime): # Add TZ_offset to provided time
-    if mytime + TZ_offset > 24:
-        mytime = mytime + TZ_offset - 24
-    else:
-        mytime = mytime + TZ_offset
-    return mytime
-
-def update_updatebar(percent): # draw a line at the top for given percent
+def utc_now(): # the RTC is set to the local time of the home location, API timestamps are UTC
+    return time.time() - home.utc_offset
+
+first_frame = None # seconds from boot_start to the first display.show(), nothing to refresh before it
+
+def swap_charts(location): # put the front charts of the shown location on screen, with a single refresh and no half drawn frame
+    auto_refresh = display.auto_refresh
+    display.auto_refresh = False
+    group[CHART_LAYER] = location.tile_grid
+    display_refresh.mark(CHART_LAYER)
+    if first_frame is not None:
+        display_refresh.refresh() # now, not held by max_fps
+    display.auto_refresh = auto_refresh
+
+updatebar_end = 0 # x where the update bar currently ends
+updatebar_color = 1 # blue, red when some data is stale
+
+def set_updatebar_color(color): # repaint the drawn part of the update bar only when the color changes
+    global updatebar_color
+    if color != updatebar_color:
+        updatebar_color = color
+        drawing.hline(UB_bitmap, 0, updatebar_end, 1, color)
+        display_refresh.mark(group.index(UB_tile_grid))
+
+label_updates, label_skips, label_alloc = 0, 0, 0 # label text changes, unchanged texts skipped, bytes allocated by the changes
+
+def set_label_text(text_area, text): # change the text of a persistent label in place, nothing is done if it is unchanged
+    global label_updates, label_skips, label_alloc
+    if text_area.text == text:
+        label_skips += 1
+        return
+    if PROFILE:
+        profiler.start(P_LABEL)
+    mem_alloc = gc.mem_alloc()
+    text_area.text = text
+    label_alloc += max(0, gc.mem_alloc() - mem_alloc)
+    if PROFILE:
+        profiler.stop(P_LABEL)
+    label_updates += 1
+    display_refresh.mark(group.index(text_area))
+
+def set_label_color(text_area, color): # change the color of a persistent label, nothing is done if it is unchanged
+    if text_area.color != color:
+        text_area.color = color
+        display_refresh.mark(group.index(text_area))
+
+def update_updatebar(percent): # draw a line at the top for given percent, only the pixels between the old and new end are written
+    global updatebar_end
     end_x = max(0, int(min(WIDTH, WIDTH * percent/100)))
-    for x in range(0, end_x):
-        BC_bitmap[x, 1] = 1 # blue
-    for x in range(end_x, WIDTH):
-        BC_bitmap[x, 1] = 0 # black
-
-def draw_day_line(bottom_left, top_right): # Draw a yellow dotted line at Noon (ie 3h after 9am) and a pink line at Midnight (ie 3h after 9pm)
-    x_max = top_right[0]
-    x_min = bottom_left[0]
-    bar_width = int((top_right[0] - bottom_left[0]) / Forecast_nb)
-
-    for forecast in range(0, Forecast_nb - 1):
-        if TZ(forecast_array[forecast][2].tm_hour) == 21:
-            for y in range(2,HEIGHT):
-                BC_bitmap[x_min + (1+forecast)*bar_width, y] = 5
-        if TZ(forecast_array[forecast][2].tm_hour) == 9:
-            for y in range(2,HEIGHT):
-                if (y % 5) == 0:
-                    BC_bitmap[x_min + (1+forecast)*bar_width, y] = 2
-
-
-def draw_bar_chart(UI_index, UI_min, UI_max, bottom_left, top_right, color): # Draw bar chart for specified UI, with given scale, at given position, with specified color
-    for x in range(bottom_left[0], top_right[0]):
-        for y in range(top_right[1], bottom_left[1]):
-            BC_bitmap[x, y] = 0 # put bar chart area in black
-    
-    y_min = top_right[1]
-    y_max = bottom_left[1]
-    bar_width = int((top_right[0] - bottom_left[0]) / Forecast_nb)
-
-    for forecast in range(0, Forecast_nb - 1):
-        UI = forecast_array[forecast][UI_index]
-
-        # add a min level of SUN to identify days and nights
-        if UI_index == 6: # add a min level of sun to identify days and nights
-            y_bar = min(simpleio.map_range(UI, UI_min, UI_max, y_max, y_min), y_max - 2)
-            # print(TZ(forecast_array[forecast][2].tm_hour), TZ(time.localtime(SUNRISE).tm_hour), TZ(time.localtime(SUNSET).tm_hour),UI_index == 6 and not((TZ(forecast_array[forecast][2].tm_hour) > TZ(time.localtime(SUNRISE).tm_hour)) and (TZ(forecast_array[forecast][2].tm_hour) < TZ(time.localtime(SUNSET).tm_hour))))
+    if end_x > updatebar_end:
+        drawing.hline(UB_bitmap, updatebar_end, end_x, 1, updatebar_color)
+    elif end_x < updatebar_end:
+        drawing.hline(UB_bitmap, end_x, updatebar_end, 1, 0) # black, a reset is a single span
+    if end_x != updatebar_end:
+        display_refresh.mark(group.index(UB_tile_grid))
+    updatebar_end = end_x
+
+def draw_day_line(location, canvas): # Draw a yellow dotted line before the slot after local Noon and a pink line before the slot after local Midnight
+    lines = {} # x -> (y_start, y_end, color, step), on the chart bitmap
+    forecast_series = location.forecast_series
+    flags = forecast_series.flags # set by forecast_series.prepare()
+    line_x = chart_layout.line_x
+    for forecast in range(0, forecast_series.count):
+        if flags[forecast] & MIDNIGHT:
+            lines[line_x[forecast]] = (2 - CHART_Y, HEIGHT - CHART_Y, 5, 1)
+        if flags[forecast] & NOON:
+            lines[line_x[forecast]] = (5 - CHART_Y, HEIGHT - CHART_Y, 2, 5) # every 5th pixel
+    canvas.draw_vlines(lines) # lines that moved since this bitmap was last drawn are erased
+
+
+def draw_bar_chart(location, bar_chart, canvas): # Draw the bar chart of one chart_layout entry from the location forecast with canvas, geometry is precomputed
+    metric = bar_chart.metric
+    y_bottom = bar_chart.y_bottom
+    canvas.clear_region(metric, bar_chart.x_min, bar_chart.x_max, bar_chart.y_top, y_bottom) # only on first draw
+
+    forecast_series = location.forecast_series
+    flags = forecast_series.flags # set by forecast_series.prepare()
+    column = forecast_series.column(metric) # scaled integers, mapped without float math
+    (scale, floor, x0, x1) = (bar_chart.scale, bar_chart.floor, bar_chart.x0, bar_chart.x1)
+    for forecast in range(0, forecast_series.count): # One Call hourly data covers 16 slots only
+        (y_bar, clipped) = scale.map(column[forecast])
+        if clipped:
+            location.clipped_bars += 1
+
+        # night slots get their own color (SUN chart: grey after SUNSET and before SUNRISE)
+        if bar_chart.night_color is not None and not (flags[forecast] & DAY):
+            color = bar_chart.night_color
         else:
-            y_bar = simpleio.map_range(UI, UI_min, UI_max, y_max, y_min)
+            color = bar_chart.color
 
-        # If UI_index is SUN, and if forecast time is after SUNRISE and before SUNSET, set color to yelow
-        if (UI_index == 6) and not((TZ(forecast_array[forecast][2].tm_hour) > TZ(time.localtime(SUNRISE).tm_hour)) and (TZ(forecast_array[forecast][2].tm_hour) < TZ(time.localtime(SUNSET).tm_hour))):
-            color_bis = 5
-        else:
-            color_bis = color
-
-        for x in range(max(0, int(bottom_left[0]+forecast*bar_width + 1)), min(WIDTH-1, bottom_left[0]+(1+forecast)*bar_width)):
-            for y in range(max(y_min, int(y_bar), 0), min(HEIGHT-1, y_max)):
-                BC_bitmap[x, y] = color_bis
+        # only the pixels that differ from the previously drawn bar are written
+        canvas.draw_bar(metric, forecast, x0[forecast], x1[forecast], min(y_bar, floor), y_bottom, color)
+    for forecast in range(forecast_series.count, forecast_series.capacity): # zero height, erases the bars of a longer forecast
+        canvas.draw_bar(metric, forecast, x0[forecast], x1[forecast], y_bottom, y_bottom, bar_chart.color)
 
 
 def update_displayed_time(): # update DISPLAYED time on screen
@@ -243,158 +338,156 @@ def update_displayed_time(): # update DISPLAYED time on screen
     print('-'*40, '\n')
 
     try:
-        mytime = time.localtime(time.time())
+        mytime = time.localtime(utc_now() + shown.utc_offset) # the RTC keeps the time of the home location
         (year, month, day, hour, minute, second, wday, yday, isdst) = mytime
         text_time = '{:02.0f}'.format(hour)+':'+'{:02.0f}'.format(minute) # +':'+'{:02.0f}'.format(second)
         # print('{:02.0f}'.format(hour)+':'+'{:02.0f}'.format(minute) +':'+'{:02.0f}'.format(second))
-        TIME_text_area = label.Label(large_font, text=text_time, color=text_color)
-        TIME_text_area.x = 28
-        TIME_text_area.y = 30
-        group[4] = TIME_text_area
+        set_label_text(TIME_text_area, text_time)
         print('DISPLAYED TIME updated succesfully at: ', '{:02.0f}'.format(hour)+':'+'{:02.0f}'.format(minute) +':'+'{:02.0f}'.format(second), '\n')
     except RuntimeError as e:
         print('/nSome error occured updating DISPLAYED TIME! ', e)
 
 
-def update_internet_time(): # Get INTERNET TIME from adafruit server
+def update_internet_time(): # set the RTC from the cheapest TIME source, raises on failure so the task is retried
     print('-'*40)
     print('Updating TIME from internet...')
     print('-'*40, '\n')
 
-    global location
-    internet_time_update_try_count = 0
-    time_response = None
-
-    TIME_SERVICE = 'https://io.adafruit.com/api/v2/%s/integrations/time/strftime?x-aio-key=%s'
-    TIME_SERVICE_STRFTIME = '&fmt=%25Y-%25m-%25d+%25H%3A%25M%3A%25S.%25L+%25j+%25u+%25z+%25Z'
-
-    api_url = None
-    try:
-        aio_username = secrets['aio_username']
-        aio_key = secrets['aio_key']
-        location = secrets['timezone']
-    except KeyError:
-        raise KeyError("\nOur time service requires a login/password to rate-limit. Please register for a free adafruit.io account and place the user/key in your secrets file under 'aio_username' and 'aio_key'")
-
-    if location:
-        print('Updating TIME from internet based on timezone ', location, '...')
-        api_url = (TIME_SERVICE + '&tz=%s') % (aio_username, aio_key, location)
-    else:
-        print('Updating TIME based on IP address')
-        api_url = TIME_SERVICE % (aio_username, aio_key)
-    api_url += TIME_SERVICE_STRFTIME
-
-    while not time_response:
-        try:
-            time_response = requests.get(api_url, timeout=10)
-
-            if esp._debug:
-                print('Time request: ', api_url)
-                print('Time reply: ', time_response.text)
-            print('Time reply: ', time_response.text, '\n')
-            times = time_response.text.split(' ')
-            the_date = times[0]
-            the_time = times[1]
-            year_day = int(times[2])
-            week_day = int(times[3])
-            is_dst = None
-        except KeyError:
-            raise KeyError("Was unable to update the time, try setting secrets['timezone'] according to http://worldtimeapi.org/timezones\n")
-
-        except Exception as error:
-            print('Updating time attempt ', internet_time_update_try_count, '/', attempts, ' failed. Retrying...', error)
-            esp.reset()
-            connect_to_wifi()
-            time.sleep(error_delay)
-            if internet_time_update_try_count >= attempts:
-                raise Exception('Was unable to update time from internet ', attempts, ' times')
-            continue
-
-    year, month, mday = [int(x) for x in the_date.split('-')]
-    the_time = the_time.split('.')[0]
-    hours, minutes, seconds = [int(x) for x in the_time.split(':')]
-    now_struct = time.struct_time((year, month, mday, hours, minutes, seconds, week_day, year_day, is_dst))
+    # Date header of the last weather response, then ESP32 NTP, then the Adafruit IO TLS request
+    if PROFILE:
+        profiler.start(P_TIME)
+    source, utc = time_keeper.utc(ensure_wifi)
+    if PROFILE:
+        profiler.stop(P_TIME)
+    now_struct = time.localtime(utc + home.utc_offset) # RTC keeps local time
     rtc.RTC().datetime = now_struct
-    time_response.close()
-    time_response = None
-
-def update_current_weather(): # update CURRENT wheather
+    home.last_state.time_synced = utc
+    time_task.deadline = 0 # DISPLAYED TIME now, realigned on the new wall clock
+    print('TIME updated from', source, 'to', '{:02d}:{:02d}:{:02d}'.format(now_struct.tm_hour, now_struct.tm_min, now_struct.tm_sec), '\n')
+
+def show_current_weather(location): # CURRENT weather labels, of the shown location only
+    if location is not shown:
+        return
+    if location.current is None: # not fetched yet, nothing from another location stays on screen
+        for text_area in (TEMP_text_area, HUM_text_area, WIND_text_area):
+            set_label_text(text_area, ' ')
+        return
+    (temp, humidity, wind) = location.current
+    temperature_1 = '{:.1f}'.format(temp)
+    humidity_1 = '{:.0f}'.format(humidity)
+    wind_1 = '{:.0f}'.format(wind)
+
+    text_temp = temperature_1 + ' C'
+    set_label_text(TEMP_text_area, text_temp)
+
+    text_hum = humidity_1 + ' %'
+    set_label_text(HUM_text_area, text_hum)
+
+    text_wind = wind_1 + ' km/h'
+    set_label_text(WIND_text_area, text_wind)
+
+def update_current_weather(location): # update CURRENT wheather, raises on failure so the task is retried
     print('-'*40)
-    print('Updating CURRENT weather...')
+    print('Updating CURRENT weather...', location.name)
     print('-'*40, '\n')
 
-    global SUNRISE, SUNSET
-    current_try_count = 0
-    json_weather_data_1_response = None
-
-    while not json_weather_data_1_response:
-        try:
-            current_try_count += 1
-
-            print('CURRENT WEATHER update attempt ', current_try_count, '/', attempts, '\n')
-            json_weather_data_1_response = requests.get(CURRENT_WEATHER_DATA_SOURCE_1, timeout=10)
-            json_weather_data_1 = json_weather_data_1_response.json() # JSON 1
-
-            weather_1 = json_weather_data_1['weather'][0]['description']
-            temperature_1 = '{:.1f}'.format(json_weather_data_1['main']['temp'])
-            humidity_1 = '{:.0f}'.format(json_weather_data_1['main']['humidity'])
-            wind_1 = '{:.0f}'.format(json_weather_data_1['wind']['speed'])
-            SUNRISE = json_weather_data_1['sys']['sunrise']
-            SUNSET = json_weather_data_1['sys']['sunset']
-
-            text_temp = temperature_1 + ' C'
-            TEMP_text_area = label.Label(large_font, text=text_temp, color=text_color)
-            TEMP_text_area.x = 24
-            TEMP_text_area.y = 75
-            group[1] = TEMP_text_area
-
-            text_hum = humidity_1 + ' %'
-            HUM_text_area = label.Label(large_font, text=text_hum, color=text_color)
-            HUM_text_area.x = 40
-            HUM_text_area.y = 125
-            group[2] = HUM_text_area
-
-            text_wind = wind_1 + ' km/h'
-            WIND_text_area = label.Label(large_font, text=text_wind, color=text_color)
-            WIND_text_area.x = 22
-            WIND_text_area.y = 220
-            group[3] = WIND_text_area
-
-            print('CURRENT weather updated succesfully after # ', current_try_count,' attempt', '\n')
-        except Exception as error:
-            print('JSON parsing attempt ', current_try_count, '/', attempts, ' failed. Retrying...', error)
-            esp.reset()
-            connect_to_wifi()
-            time.sleep(error_delay)
-            if current_try_count >= attempts:
-                raise Exception('Current weather update failed ', attempts, ' times')
-            continue
-    json_weather_data_1_response.close()
-    json_weather_data_1_response = None
+    ensure_wifi()
+    gc_policy.collect('network') # the response and the parse need the largest free blocks
+    if PROFILE:
+        profiler.start(P_HTTP_CURRENT)
+    json_weather_data_1_response = http.get(location.current_url, timeout=10)
+    if PROFILE:
+        profiler.stop(P_HTTP_CURRENT)
+    try:
+        header_time.observe(json_weather_data_1_response.headers)
+        if json_weather_data_1_response.status_code != 200: # error replies are JSON too, {"cod":429,"message":...}
+            raise RuntimeError('CURRENT weather request answered ' + str(json_weather_data_1_response.status_code))
+        # streamed in JSON_CHUNK_SIZE chunks, only the fields below are kept
+        if PROFILE:
+            profiler.start(P_PARSE_CURRENT)
+        (weather_1, temp, humidity, wind, sunrise, sunset, timezone, clouds, pressure) = owm_stream.parse_current(owm_stream.JsonStream(
+            json_weather_data_1_response.iter_content(chunk_size=owm_stream.JSON_CHUNK_SIZE)))
+        if PROFILE:
+            profiler.stop(P_PARSE_CURRENT)
+    finally:
+        json_weather_data_1_response.close()
+        json_weather_data_1_response = None
+    location.sunrise, location.sunset = sunrise, sunset
+    if timezone is not None:
+        location.utc_offset = timezone
+    location.current = (temp, humidity, wind)
+    location.current_old = False
+    show_current_weather(location)
+    location.last_state.current_fetched = fetch_time()
+    log_observation(location, clouds, pressure)
+
+    print('CURRENT weather updated succesfully', '\n')
+
+def build_forecast_series(location, records, now): # refill the location spare series from parsed (utc, icon, temp, humidity, rain, clouds, wind) records, returns the next slot start
+    expires = None # start of the next forecast slot, the data cannot change before it
+    spare_series = location.spare_series
+    spare_series.clear()
+    forecast = 0
+    for (utc, icon, temp, humidity, rain, clouds, wind) in records:
+        if utc > now and (expires is None or utc < expires):
+            expires = utc
+        if rain is None:
+            rain = 0
+        if clouds is None:
+            cloud = 0
+            print('sun error forecast ' + str(forecast))
+        else:
+            cloud = 100 - clouds
+        if wind is None:
+            wind = 0
+            print('wind error forecast ' + str(forecast))
+        if humidity is None:
+            humidity = 0
+            print('humidity error forecast ' + str(forecast))
+        spare_series.append(utc, icon, temp, rain, cloud, wind, humidity)
+        forecast += 1
+    return expires
 
-def update_forecast(): # update FORECAST array and barcharts
+def update_forecast(location): # update FORECAST array and barcharts, raises on failure so the task is retried
     print('-'*40)
-    print('Updating FORECASTS...')
+    print('Updating FORECASTS...', location.name)
     print('-'*40, '\n')
 
-    global forecast_array
-    forecast_try_count = 0
-    json_forecast_data = None
-
-    while not json_forecast_data:
-        try:
-            forecast_try_count += 1
-            print('FORECASTS update attempt ', forecast_try_count, '/', attempts, '\n')
-            forecast_data = requests.get(FORECAST_WEATHER_DATA_SOURCE, timeout=10)
-            json_forecast_data = forecast_data.json()
-        except Exception as error:
-            print('FORECASTS update attempt ', forecast_try_count, '/', attempts, ' failed. Retrying...\n', error)
-            esp.reset()
-            connect_to_wifi()
-            time.sleep(error_delay)
-            if forecast_try_count >= attempts:
-                raise Exception('FORECASTS update failed ', attempts, ' times')
-            continue
+    now = fetch_time() # the RTC may not be set yet at boot
+    if forecast_cache.fresh(location.forecast_url, now): # nothing new before the next 3 hours slot
+        print('FORECASTS unchanged until the next forecast slot, download and redraw skipped\n')
+        forecast_cache.report()
+        return
+
+    ensure_wifi()
+    gc_policy.collect('network')
+    if PROFILE:
+        profiler.start(P_HTTP_FORECAST)
+    forecast_data = http.get(location.forecast_url, headers=forecast_cache.request_headers(location.forecast_url), timeout=10)
+    if PROFILE:
+        profiler.stop(P_HTTP_FORECAST)
+    try:
+        header_time.observe(forecast_data.headers)
+        if forecast_data.status_code == 304: # validators matched, the forecast on screen is current
+            forecast_cache.revalidated(location.forecast_url)
+            location.last_state.forecast_fetched = fetch_time()
+            print('FORECASTS not modified, redraw skipped\n')
+            forecast_cache.report()
+            return
+        if forecast_data.status_code != 200: # error replies are JSON too, nothing is stored nor drawn
+            raise RuntimeError('FORECASTS request answered ' + str(forecast_data.status_code))
+        # the response is streamed in JSON_CHUNK_SIZE chunks and reading stops after Forecast_nb - 1 items
+        if PROFILE:
+            profiler.start(P_PARSE_FORECAST)
+        stream = owm_stream.JsonStream(forecast_data.iter_content(chunk_size=owm_stream.JSON_CHUNK_SIZE))
+        expires = build_forecast_series(location, owm_stream.parse_forecast(stream, Forecast_nb - 1), now)
+        if PROFILE:
+            profiler.stop(P_PARSE_FORECAST)
+        forecast_cache.store(location.forecast_url, forecast_data.headers, stream.bytes_read, expires)
+    finally:
+        forecast_data.close()
+        forecast_data = None
+    location.swap_series() # the last good forecast stays on screen if anything above failed
 
     # intermittent errors
         # esp32spi_socket.py didn't receive full response, failing out
@@ -403,111 +496,398 @@ def update_forecast(): # update FORECAST array and barcharts
         # File "adafruit_requests.py", line 223, in request ValueError: invalid syntax for integer with base 10
         # File "adafruit_esp32spi/adafruit_esp32spi.py", line 589, in get_host_by_name RuntimeError: Failed to request hostname
 
-    # print(json_forecast_data)
-    # forecast_array = ( (forecast, utc, struct_time, icon, temp, rain, sun, wind) )
-    forecast_array = []
-    for forecast in range(0, Forecast_nb - 1): # number of forecasts
-        utc = json_forecast_data['list'][forecast]['dt']
-        struct_time = time.localtime(utc)
-        # print(struct_time)
-        icon = json_forecast_data['list'][forecast]['weather'][0]['icon']
-        temp =  json_forecast_data['list'][forecast]['main']['temp']
-        try:
-            rain = json_forecast_data['list'][forecast]['rain']['3h']
-        except KeyError:
-            rain = 0
-        try:
-            cloud = 100 - json_forecast_data['list'][forecast]['clouds']['all']
-        except KeyError:
-            cloud = 0
-            print('sun error forecast ' + str(forecast))
+    draw_forecast(location)
+    location.last_state.forecast_fetched = fetch_time()
+    forecast_cache.report()
+    print('FORECASTS updated succesfully', '\n')
+
+def draw_forecast(location): # redraw the bar charts of the location from its forecast series on the spare bitmap, then swap it in
+    global spare_charts
+    canvas = spare_charts[1]
+    forecast_series = location.forecast_series
+    print('forecast slots', forecast_series.count, '\n')
+    forecast_series.prepare(location.utc_offset, location.sunrise, location.sunset) # day/night/midnight/noon of every slot, once for all charts
+    pixels_written = canvas.pixels_written
+    location.clipped_bars = 0
+    charts = chart_layout.charts
+    for index in range(len(charts)): # one bar chart per CHART_LAYOUT entry
+        if PROFILE:
+            profiler.start(P_DRAW + index)
+        draw_bar_chart(location, charts[index], canvas)
+        if PROFILE:
+            profiler.stop(P_DRAW + index)
+    if PROFILE:
+        profiler.start(P_DAY_LINE)
+    draw_day_line(location, canvas) # draw day line
+    if PROFILE:
+        profiler.stop(P_DAY_LINE)
+    print('Bar charts redrawn, pixels written: ', canvas.pixels_written - pixels_written, ' | bars clipped to the scale: ', location.clipped_bars)
+    (refreshes, refresh_time) = (display_refresh.refreshes, display_refresh.time)
+    spare_charts = location.swap_buffers(spare_charts)
+    if location is shown:
+        swap_charts(location)
+    print('Charts swapped in, display refreshes: {} in {:.3f}s'.format(display_refresh.refreshes - refreshes, display_refresh.time - refresh_time))
+    print('Sunrise: {:02d}:{:02d} | Sunset: {:02d}:{:02d}'.format(*(location.local_hour_minute(location.sunrise) + location.local_hour_minute(location.sunset))))
+    gc_policy.collect('redraw') # the parse leftovers go before the next task allocates
+
+def update_combined_weather(location): # CURRENT weather and FORECASTS from a single One Call request, raises on failure so the task is retried
+    print('-'*40)
+    print('Updating CURRENT weather and FORECASTS in one request...', location.name)
+    print('-'*40, '\n')
+
+    global combined_fetch
+
+    ensure_wifi()
+    gc_policy.collect('network')
+    if PROFILE:
+        profiler.start(P_HTTP_WEATHER)
+    weather_data = http.get(location.combined_url, timeout=10)
+    if PROFILE:
+        profiler.stop(P_HTTP_WEATHER)
+    try:
+        header_time.observe(weather_data.headers)
+        if weather_data.status_code in (401, 404): # endpoint not available with this key, use the two requests from now on
+            combined_fetch = False
+            for other in locations: # FORECASTS tasks did nothing so far
+                other.forecast_task.deadline = 0
+            raise RuntimeError('Combined weather request answered ' + str(weather_data.status_code) + ', falling back to separate requests')
+        if weather_data.status_code != 200: # 429, 5xx...: retried with backoff, the combined request stays on
+            raise RuntimeError('Combined weather request answered ' + str(weather_data.status_code))
+        # hourly items are grouped by 3 to match the FORECASTS slots, reading stops once they are all read
+        if PROFILE:
+            profiler.start(P_PARSE_WEATHER)
+        stream = owm_stream.JsonStream(weather_data.iter_content(chunk_size=owm_stream.JSON_CHUNK_SIZE))
+        current, records, timezone = owm_stream.parse_onecall(stream, Forecast_nb - 1)
+        build_forecast_series(location, records, utc_now())
+        if PROFILE:
+            profiler.stop(P_PARSE_WEATHER)
+    finally:
+        weather_data.close()
+        weather_data = None
+    (weather_1, temp, humidity, wind, location.sunrise, location.sunset, clouds, pressure) = current
+    if timezone is not None:
+        location.utc_offset = timezone
+    location.current = (temp, humidity, wind)
+    location.current_old = False
+    show_current_weather(location)
+    location.swap_series()
+    draw_forecast(location)
+    location.last_state.current_fetched = location.last_state.forecast_fetched = fetch_time()
+    log_observation(location, clouds, pressure)
+    print('CURRENT weather and FORECASTS updated succesfully', '\n')
+
+def update_weather(location): # CURRENT weather, with the FORECASTS in the same request while combined_fetch is on
+    if combined_fetch:
+        update_combined_weather(location)
+    else:
+        update_current_weather(location)
+
+def update_separate_forecast(location): # FORECASTS, nothing to do while they come with the CURRENT weather
+    if not combined_fetch:
+        update_forecast(location)
+
+
+last_request_tick = 0 # scheduler tick of the last network update that sent a request
+
+def network_task(update, policy, period, *args): # wrap a network update so failures are rescheduled with backoff instead of slept through
+    def task():
+        global last_request_tick
+        if last_request_tick == scheduler.ticks: # one request per loop pass, the other updates wait for the next ones
+            return request_gap
+        sent = http.requests
         try:
-            wind = json_forecast_data['list'][forecast]['wind']['speed']
-        except KeyError:
-            wind = 0
-            print('wind error forecast ' + str(forecast))
+            update(*args)
+        except Exception as error:
+            last_request_tick = scheduler.ticks # the failed attempt may have sent one
+            delay = policy.failure(period)
+            print(policy.name, 'update failed', policy.failures, 'time(s) in a row, retrying in {:.0f}s.'.format(delay), error, '\n')
+            esp.reset() # reconnected by ensure_wifi() on the next attempt
+            http.forget()
+            show_stale()
+            return delay
+        if http.requests != sent:
+            last_request_tick = scheduler.ticks
+        policy.success()
+        show_stale()
+    return task
+
+def show_stale(): # last good data stays on screen, grey labels and a red update bar mark the shown location data as stale
+    current_stale = shown.current_retry.stale or shown.current_old
+    color = stale_text_color if current_stale else text_color
+    for text_area in (TEMP_text_area, HUM_text_area, WIND_text_area):
+        set_label_color(text_area, color)
+    set_updatebar_color(8 if (internet_time_retry.stale or current_stale or shown.forecast_retry.stale) else 1)
+
+def show_location(location): # the prepared charts and the labels of location replace the shown ones, nothing is redrawn
+    global shown
+    shown = location
+    auto_refresh = display.auto_refresh
+    display.auto_refresh = False # labels and charts change in the same frame
+    set_label_text(LOCATION_text_area, location.name)
+    show_current_weather(location)
+    update_displayed_time()
+    show_stale()
+    swap_charts(location)
+    display.auto_refresh = auto_refresh
+
+def fetch_time(): # UTC from the Date header of the last response, the RTC if there is no recent one. Right even before the RTC is set
+    try:
+        return header_time.utc()
+    except RuntimeError:
+        return utc_now()
+
+def snapshot_task(): # write the last known state of every location to its SNAPSHOT_FILE, skipped when nothing changed since the last write
+    for location in locations:
+        if location.current is None or location.forecast_series.count == 0: # nothing complete to keep yet
+            continue
+        last_state = location.last_state
+        last_state.utc_offset = location.utc_offset
+        last_state.sunrise, last_state.sunset = location.sunrise, location.sunset
+        last_state.current = location.current
+        last_state.forecast_cache = forecast_cache.entry(location.forecast_url)
         try:
-            humidity = json_forecast_data['list'][forecast]['main']['humidity']
-        except KeyError:
-            humidity = 0
-            print('humidity error forecast ' + str(forecast))
-        forecast_array.append((forecast, utc, struct_time, icon, temp, rain, cloud, wind, humidity))
-    print('len of forecast array', len(forecast_array), '\n')
-    # forecast_array content = ( (0 forecast, 1 utc, 2 struct_time, 3 icon, 4 temp, 5 rain, 6 cloud, 7 wind, 8 humidity) )
-    draw_bar_chart(6, sun_min, sun_max, (180, 48), (319, 1), 2)  # SUN/CLOUDS
-    draw_bar_chart(4, temp_min, temp_max, (180, 96), (319, 49), 6)  # TEMP
-    draw_bar_chart(8, hum_min, hum_max, (180, 144), (319, 97), 4)  # HUMIDITY
-    draw_bar_chart(5, rain_min, rain_max, (180, 192), (319, 145), 1)  # RAIN
-    draw_bar_chart(7, wind_min, wind_max, (180, 239), (319, 193), 5)  # WIND
-    draw_day_line((180,HEIGHT), (WIDTH,0)) # draw day line
-    print('Sunrise: ', TZ(time.localtime(SUNRISE).tm_hour), ':', time.localtime(SUNRISE).tm_min, ' | Sunset: ', TZ(time.localtime(SUNSET).tm_hour), ':', time.localtime(SUNSET).tm_min)
-    forecast_data.close()
-    forecast_data = None
-    print('FORECASTS updated succesfully after # ', forecast_try_count, ' attempts', '\n')
+            if last_state.save(location.forecast_series):
+                print('Last known state saved to', last_state.path, '\n')
+        except OSError as e: # no SD card, or read-only file system
+            print('Last known state not saved: ', e, '\n')
+
+def log_observation(location, clouds, pressure): # append the CURRENT weather to the location HISTORY_FILE, written every history_batch observations
+    (temp, humidity, wind) = location.current
+    try:
+        if location.history.append(location.last_state.current_fetched, temp, humidity, wind, clouds, pressure):
+            print('Last', history_batch, 'observations written to', location.history.path, '\n')
+    except OSError as e: # no SD card, the update itself succeeded
+        print('Observations not written: ', e, '\n')
+
+def snapshot_age(fetched): # seconds since fetched (UTC), None if unknown or if the RTC was reset since
+    now = utc_now()
+    if not fetched or now < fetched:
+        return None
+    return now - fetched
+
+def first_run_delay(fetched): # seconds until the first update of data fetched at fetched, 0 if it is not fresh
+    # restored FORECASTS wait for the end of their TTL on their own: the FORECASTS task finds the cache entry fresh
+    age = snapshot_age(fetched)
+    if age is None or age >= weather_update_freq:
+        return 0
+    return weather_update_freq - age
+
+def restore_last_state(location): # draw the snapshot of the location SNAPSHOT_FILE, grey if it is shown and older than an update period. False if there is none
+    last_state = location.last_state
+    if not last_state.load(location.spare_series):
+        print('No last known state in', last_state.path, '\n')
+        return False
+    (location.sunrise, location.sunset, location.utc_offset) = (last_state.sunrise, last_state.sunset, last_state.utc_offset)
+    location.current = last_state.current
+    show_current_weather(location)
+    location.swap_series()
+    draw_forecast(location)
+    age = snapshot_age(last_state.current_fetched)
+    location.current_old = age is None or age >= weather_update_freq
+    if location.current_old and location is shown:
+        for text_area in (TEMP_text_area, HUM_text_area, WIND_text_area):
+            set_label_color(text_area, stale_text_color)
+    forecast_age = snapshot_age(last_state.forecast_fetched)
+    if (location.current_old or forecast_age is None or forecast_age >= weather_update_freq) and location is shown:
+        set_updatebar_color(8)
+    print('Last known state of', location.name, 'restored,', 'age unknown' if age is None else '{:.0f}s old'.format(age), '\n')
+    return True
 
 
 #############################################
-# WEATHER DATA LOCATION                     #
+# LAST KNOWN STATE                          #
 #############################################
 print('-'*40)
-print('URLs')
+print('Showing LAST KNOWN state...')
 print('-'*40, '\n')
 
-CURRENT_WEATHER_DATA_SOURCE_1 = 'http://api.openweathermap.org/data/2.5/weather?id='+str(WEATHER_LOCATION)
-CURRENT_WEATHER_DATA_SOURCE_1 += '&units=metric&appid='+secrets['openweather_token']
-print('CURRENT weather API URL: ', CURRENT_WEATHER_DATA_SOURCE_1)
+try: # the SD card of the PyPortal keeps the state, CIRCUITPY is read-only for the code
+    import adafruit_sdcard
+    import storage
+    sdcard = adafruit_sdcard.SDCard(spi, DigitalInOut(board.SD_CS))
+    storage.mount(storage.VfsFat(sdcard), '/sd')
+except (ImportError, OSError) as e:
+    print('No SD card, the last known state is not kept: ', e)
 
-FORECAST_WEATHER_DATA_SOURCE = 'http://api.openweathermap.org/data/2.5/forecast?id=' + str(WEATHER_LOCATION)
-FORECAST_WEATHER_DATA_SOURCE += '&units=metric&appid=' + secrets['openweather_token'] + '&cnt=40'  # limiting results
-print('FORECASTS weather API URL: ', FORECAST_WEATHER_DATA_SOURCE, '\n')
+for location in locations: # the home location first, its UTC offset is the one of the RTC
+    location.last_state = Snapshot(SNAPSHOT_FILE.format(location.index), Forecast_nb - 1)
+    location.history = History(HISTORY_FILE.format(location.index), history_size, history_batch) # read back with location.history.read(start, end)
+    restore_last_state(location)
+display.show(group) # first frame, before any network access
+first_frame = time.monotonic() - boot_start # seconds from boot_start to the first display.show()
+print('First frame {:.2f}s after boot (target 2s)\n'.format(first_frame))
 
 
 #############################################
-# INFINITE LOOP                             #
+# CONNECT TO WIFI                           #
 #############################################
 print('-'*40)
-print('Beginning infinite loop...')
+print('Connecting to WIFI...')
 print('-'*40, '\n')
 
-last_update_displayed_time, last_update_internet_time, last_update_current_weather, last_update_forecast = 0,0,0,0
+def ensure_wifi(): # single connection attempt, raises RuntimeError so the caller can retry later without blocking
+    if not esp.is_connected:
+        if PROFILE:
+            profiler.start(P_WIFI)
+        esp.connect_AP(secrets['ssid'], secrets['password'])
+        if PROFILE:
+            profiler.stop(P_WIFI)
+        print('Connected to', str(esp.ssid, 'utf-8'), '\tRSSI:', esp.rssi, '   IP address is', esp.pretty_ip(esp.ip_address), '\n')
 
-while True:
+if esp.status == adafruit_esp32spi.WL_IDLE_STATUS:
+    print('\nPYPORTAL found and in idle mode')
+# connected by the first network task, with backoff if it fails. Not at all while the snapshot is fresh
 
-    # UPDATE UPDATE BAR
-    progress = int(100*(time.monotonic() - last_update_displayed_time)/displayed_time_update_freq)
+requests.set_socket(socket, esp)
+http = KeepAliveSession(requests) # one socket per host kept open between the requests of a cycle
 
-    update_updatebar(progress)
 
-    # DISPLAYED TIME
-    if time.monotonic() - last_update_displayed_time > displayed_time_update_freq:
-        update_displayed_time()
-        last_update_displayed_time = time.monotonic()
+#############################################
+# WEATHER DATA LOCATION                     #
+#############################################
+print('-'*40)
+print('URLs')
+print('-'*40, '\n')
 
-    # INTERNET TIME
-    if time.monotonic() - last_update_internet_time > weather_update_freq:
-        update_internet_time()
-        last_update_internet_time = time.monotonic()
+for location in locations:
+    location.current_url = 'http://api.openweathermap.org/data/2.5/weather?id='+str(location.city_id)
+    location.current_url += '&units=metric&appid='+secrets['openweather_token']
+    print('CURRENT weather API URL: ', location.current_url)
 
-    # CURRENT WEATHER
-    if time.monotonic() - last_update_current_weather > weather_update_freq:
-        update_current_weather()
-        last_update_current_weather = time.monotonic()
+TIME_SERVICE = 'https://io.adafruit.com/api/v2/%s/integrations/time/strftime?x-aio-key=%s'
+TIME_SERVICE_STRFTIME = '&fmt=%25Y-%25m-%25d+%25H%3A%25M%3A%25S.%25L+%25j+%25u+%25z+%25Z'
 
-    # FORECASTS
-    if time.monotonic() - last_update_forecast > weather_update_freq:
-        update_forecast()
-        last_update_forecast = time.monotonic()
+header_time = HeaderTimeSource(weather_update_freq) # fed with the headers of the weather responses
+time_sources = [header_time, NtpTimeSource(esp)]
+try:
+    aio_username = secrets['aio_username']
+    aio_key = secrets['aio_key']
+    location = secrets.get('timezone')
+    if location:
+        TIME_DATA_SOURCE = (TIME_SERVICE + '&tz=%s') % (aio_username, aio_key, location)
+    else:
+        TIME_DATA_SOURCE = TIME_SERVICE % (aio_username, aio_key)
+    TIME_DATA_SOURCE += TIME_SERVICE_STRFTIME
+    time_sources.append(AdafruitIOTimeSource(http, TIME_DATA_SOURCE)) # last resort, TLS request
+except KeyError:
+    print("Adafruit IO time service disabled, place 'aio_username' and 'aio_key' in your secrets file to use it as a last resort\n")
+time_keeper = TimeKeeper(time_sources)
+
+forecast_cache = ResponseCache() # validators and expiry of the forecast responses, by URL so one entry per location
+combined_fetch = COMBINED_FETCH # turned off if the combined request is refused
+for location in locations:
+    location.forecast_url = 'http://api.openweathermap.org/data/2.5/forecast?id=' + str(location.city_id)
+    location.forecast_url += '&units=metric&appid=' + secrets['openweather_token'] + '&cnt=' + str(Forecast_nb - 1)  # limiting results, a kept-alive socket must be drained before reuse
+    print('FORECASTS weather API URL: ', location.forecast_url, '\n')
+    last_state = location.last_state
+    if last_state.forecast_cache and snapshot_age(last_state.forecast_fetched) is not None: # the RTC kept the time, so the expiry holds
+        forecast_cache.restore(location.forecast_url, last_state.forecast_cache)
+
+    location.combined_url = 'http://api.openweathermap.org/data/2.5/onecall?lat=' + str(location.lat) + '&lon=' + str(location.lon)
+    location.combined_url += '&exclude=minutely,daily,alerts&units=metric&appid=' + secrets['openweather_token']
+    if combined_fetch:
+        print('COMBINED weather API URL: ', location.combined_url, '\n')
+
+
+#############################################
+# INFINITE LOOP                             #
+#############################################
+print('-'*40)
+print('Beginning infinite loop...')
+print('-'*40, '\n')
 
-    # BRIGHTNESS
+progress = 0
+
+def updatebar_task(): # progress until the next DISPLAYED TIME update
+    global progress
+    if time_task.last_run is not None:
+        progress = int(100*(time.monotonic() - time_task.last_run)/(time_task.deadline - time_task.last_run))
+    update_updatebar(progress)
+
+def displayed_time_task(): # aligned on the wall clock so the minute changes on time
+    update_displayed_time()
+    return displayed_time_update_freq - time.localtime().tm_sec % displayed_time_update_freq
+
+def brightness_task():
     board.DISPLAY.brightness = simpleio.map_range(light.value, 0, 40000, 0, 100) / 100
 
-    # CLEAR MEMORY
-    print('X Clear memory... Mem free: {:,} allocated: {:,}'.format(gc.mem_free(), gc.mem_alloc()),end='')
-    gc.collect()
-    print(' | Mem free: {:,} allocated: {:,}'.format(gc.mem_free(), gc.mem_alloc()),end='')
-    print(' | Progress: {:02.0f}'.format(progress), '%')
+def gc_task(): # CLEAR MEMORY, only once gc_idle_threshold bytes were allocated since the last collection
+    if gc_policy.idle():
+        print('X Memory cleared | Mem free: {:,} allocated: {:,} | Progress: {:02.0f} % | GC total: {:.2f}s | Labels changed: {} skipped: {} allocated: {:,}'.format(
+            gc.mem_free(), gc.mem_alloc(), progress, gc_policy.time, label_updates, label_skips, label_alloc))
+        gc_policy.sample() # the line above is not counted as idle allocation
+
+def location_task(): # next location on screen
+    show_location(locations[(shown.index + 1) % len(locations)])
+
+# tasks due at the same time run in this order: weather first so INTERNET TIME can use the Date header of its
+# response. Network tasks send one request per loop pass at most (see network_task()), so the locations are fetched
+# one after the other, request_gap apart, and INTERNET TIME may run passes later: it reruns the DISPLAYED TIME itself
+retry_budget = RetryBudget(attempts, attempts_refill) # shared by all endpoints
+internet_time_retry = RetryPolicy('INTERNET TIME', retry_budget, error_delay, max_error_delay)
+
+scheduler = Scheduler()
+for location in locations:
+    # with COMBINED_FETCH the CURRENT weather task fetches both and the FORECASTS task does nothing, unless the combined request is refused
+    location.current_retry = RetryPolicy('CURRENT weather ' + location.name, retry_budget, error_delay, max_error_delay)
+    location.forecast_retry = RetryPolicy('FORECASTS ' + location.name, retry_budget, error_delay, max_error_delay)
+    last_state = location.last_state
+    scheduler.add('current ' + location.name, weather_update_freq, network_task(update_weather, location.current_retry, weather_update_freq, location),
+        first_run_delay(last_state.current_fetched)) # a fresh snapshot waits for its next update
+    location.forecast_task = scheduler.add('forecast ' + location.name, weather_update_freq,
+        network_task(update_separate_forecast, location.forecast_retry, weather_update_freq, location))
+scheduler.add('internet time', weather_update_freq, network_task(update_internet_time, internet_time_retry, weather_update_freq),
+    first_run_delay(home.last_state.time_synced))
+time_task = scheduler.add('displayed time', displayed_time_update_freq, displayed_time_task)
+scheduler.add('updatebar', update_freq, updatebar_task)
+scheduler.add('brightness', update_freq, brightness_task)
+scheduler.add('gc', update_freq, gc_task)
+if len(locations) > 1:
+    scheduler.add('location', location_freq, location_task, location_freq)
+def report_task():
+    scheduler.report()
+    http.report()
+    gc_policy.report()
+    display_refresh.report()
+    time_keeper.report()
+    policies = [internet_time_retry]
+    for location in locations:
+        policies += [location.current_retry, location.forecast_retry]
+    print('Update failures since boot: ' + ' | '.join('{}: {}'.format(policy.name, policy.total_failures) for policy in policies))
+    for location in locations:
+        location.last_state.report()
+        location.history.report()
+    print('First frame {:.2f}s after boot'.format(first_frame))
+
+scheduler.add('report', scheduler_report_freq, report_task)
+scheduler.add('snapshot', snapshot_freq, snapshot_task)
+
+serial_line = '' # characters typed on the serial console since the last Enter
+
+def serial_task(): # p then Enter on the serial console prints the profile
+    global serial_line
+    available = int(supervisor.runtime.serial_bytes_available) # a bool on older firmware, one byte then
+    if not available:
+        return
+    serial_line += sys.stdin.read(available) # only what arrived, a key without Enter does not block the tasks
+    if '\n' not in serial_line:
+        return
+    (command, serial_line) = serial_line.split('\n', 1)
+    if command.strip() == 'p':
+        profiler.report()
+
+if PROFILE and supervisor:
+    scheduler.add('serial', update_freq, serial_task)
+
+display.auto_refresh = False # the group stays shown, refreshed below only when a layer changed
+while True:
+    scheduler.run_pending()
 
     # UPDATE DISPLAY
-    display.show(group)
+    if PROFILE:
+        profiler.start(P_REFRESH)
+    wait = display_refresh.update() # seconds until max_fps allows the pending refresh
+    if PROFILE:
+        profiler.stop(P_REFRESH)
 
-    time.sleep(update_freq)
+    scheduler.sleep(wait) # until the nearest task deadline
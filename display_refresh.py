@@ -0,0 +1,69 @@
+''' Display refresh on change only.
+The code marks the group layers it changes, the main loop turns auto_refresh off and update() refreshes the screen
+once for all the changes since the last refresh, max_fps times per second at most. When nothing changed nothing is sent.
+'''
+
+import time
+
+
+class DisplayRefresh:
+    def __init__(self, display, layers, max_fps=None): # layers: names, in the order of the display group
+        self.display = display
+        self.layers = layers
+        self.min_interval = 1 / max_fps if max_fps else 0
+        self.refreshes = 0
+        self.time = 0 # seconds spent in display.refresh()
+        self.idle = 0 # update() calls with nothing to refresh
+        self.held = 0 # update() calls that waited for max_fps
+        self.changes = [0] * len(layers) # marks of each layer since boot
+        self._dirty = bytearray(len(layers)) # 1 for the layers changed since the last refresh
+        self._last = None # time.monotonic() at the end of the last refresh
+        self._legacy = False # CircuitPython 6 display.refresh(), an int target frame rate only
+        self._start = time.monotonic()
+
+    def mark(self, layer): # layer: index in the display group
+        self._dirty[layer] = 1
+        self.changes[layer] += 1
+
+    def dirty(self, layer): # True if the layer changed since the last refresh
+        return self._dirty[layer] == 1
+
+    def refresh(self): # now, however long ago the last refresh was
+        start = time.monotonic()
+        self._refresh()
+        self._last = time.monotonic()
+        self.time += self._last - start
+        self.refreshes += 1
+        for layer in range(len(self._dirty)):
+            self._dirty[layer] = 0
+
+    def _refresh(self):
+        if not self._legacy:
+            try: # CircuitPython 7 and later: no frame rate, refresh right now
+                self.display.refresh(target_frames_per_second=None, minimum_frames_per_second=0)
+                return
+            except TypeError:
+                self._legacy = True
+        # CircuitPython 6 skips the frame and returns False when its previous call is older than one target frame,
+        # which is always the case here: the second call is right after the first one and refreshes
+        if not self.display.refresh(target_frames_per_second=60, minimum_frames_per_second=0):
+            self.display.refresh(target_frames_per_second=60, minimum_frames_per_second=0)
+
+    def update(self): # refresh if a layer changed. Seconds until the refresh max_fps holds back, None if there is none
+        if not any(self._dirty):
+            self.idle += 1
+            return None
+        if self._last is not None:
+            wait = self._last + self.min_interval - time.monotonic()
+            if wait > 0:
+                self.held += 1
+                return wait
+        self.refresh()
+        return None
+
+    def report(self):
+        hours = (time.monotonic() - self._start) / 3600
+        print('Display: {} refreshes, {:.0f} per hour, {:.2f}s total | nothing changed: {} | held by max fps: {}'.format(
+            self.refreshes, self.refreshes / hours if hours else 0, self.time, self.idle, self.held))
+        print('Layer changes: ' + ' '.join('{}={}'.format(self.layers[layer], self.changes[layer])
+            for layer in range(len(self.layers)) if self.changes[layer]))
@@ -0,0 +1,63 @@
+''' Bulk drawing helpers for displayio bitmaps.
+Uses the native bitmaptools fills when the firmware has them and falls back to plain Python loops.
+All ranges are half-open ([x0, x1), [y0, y1)) and every function returns the number of pixels written.
+'''
+
+try:
+    import bitmaptools
+except ImportError:
+    bitmaptools = None
+
+BACKENDS = ('bitmaptools', 'python') if bitmaptools else ('python',)
+backend = BACKENDS[0]
+
+
+def use_backend(name): # select 'bitmaptools' or 'python', used by the benchmarks
+    global backend
+    if name not in BACKENDS:
+        raise ValueError('Drawing backend not available: ' + name)
+    backend = name
+
+
+def fill_rect(bitmap, x0, y0, x1, y1, color):
+    if x1 <= x0 or y1 <= y0:
+        return 0
+    if backend == 'bitmaptools':
+        bitmaptools.fill_region(bitmap, x0, y0, x1, y1, color)
+    else:
+        for x in range(x0, x1):
+            for y in range(y0, y1):
+                bitmap[x, y] = color
+    return (x1 - x0) * (y1 - y0)
+
+
+def hline(bitmap, x0, x1, y, color):
+    if x1 <= x0:
+        return 0
+    if backend == 'bitmaptools':
+        bitmaptools.draw_line(bitmap, x0, y, x1 - 1, y, color)
+    else:
+        for x in range(x0, x1):
+            bitmap[x, y] = color
+    return x1 - x0
+
+
+def vline(bitmap, x, y0, y1, color):
+    if y1 <= y0:
+        return 0
+    if backend == 'bitmaptools':
+        bitmaptools.draw_line(bitmap, x, y0, x, y1 - 1, color)
+    else:
+        for y in range(y0, y1):
+            bitmap[x, y] = color
+    return y1 - y0
+
+
+def dotted_vline(bitmap, x, y0, y1, color, step): # one pixel every step pixels, starting at y0
+    if step == 1:
+        return vline(bitmap, x, y0, y1, color)
+    count = 0
+    for y in range(y0, y1, step): # no native dotted line, only 1/step of the pixels are written anyway
+        bitmap[x, y] = color
+        count += 1
+    return count
@@ -0,0 +1,84 @@
+''' Compact columnar storage for the forecast slots.
+Each metric is a typed array of scaled integers, allocated once and refilled in place on every refresh.
+'''
+
+import array
+
+# metric -> (array typecode, scale): stored value = round(value * scale)
+METRICS = {
+    'temp': ('h', 10), # Celsius x10, int16
+    'rain': ('H', 100), # mm x100, uint16
+    'sun': ('B', 1), # % of sky without clouds, uint8
+    'wind': ('H', 10), # wind speed x10, uint16
+    'humidity': ('B', 1), # %, uint8
+}
+
+
+COLUMNS = ('utc', 'icon') + tuple(METRICS) # filled by append(), flags are derived from them by prepare()
+
+
+# bits of ForecastSeries.flags
+DAY = 1 # slot time between sunrise and sunset
+MIDNIGHT = 2 # local day changes between this slot and the next one
+NOON = 4 # local noon falls between this slot and the next one
+
+SLOT = 10800 # seconds between OpenWeatherMap forecast slots
+
+
+def icon_code(icon): # '10d' -> 20, '10n' -> 21, unknown -> 0
+    try:
+        return int(icon[:2]) << 1 | (icon[2:3] == 'n')
+    except (TypeError, ValueError):
+        return 0
+
+
+class ForecastSeries:
+    __slots__ = ('capacity', 'count', 'utc', 'icon', 'temp', 'rain', 'sun', 'wind', 'humidity', 'flags')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.count = 0
+        self.utc = array.array('l', [0] * capacity) # UTC seconds, int32
+        self.icon = bytearray(capacity) # icon_code()
+        self.flags = bytearray(capacity) # DAY | MIDNIGHT | NOON, set by prepare()
+        for metric in METRICS:
+            typecode = METRICS[metric][0]
+            setattr(self, metric, array.array(typecode, [0] * capacity))
+
+    def clear(self): # reuse the buffers for a new refresh
+        self.count = 0
+
+    def append(self, utc, icon, temp, rain, sun, wind, humidity):
+        slot = self.count
+        if slot >= self.capacity:
+            raise IndexError('ForecastSeries is full')
+        self.utc[slot] = utc
+        self.icon[slot] = icon_code(icon)
+        self.temp[slot] = max(-32768, min(32767, round(temp * 10)))
+        self.rain[slot] = max(0, min(65535, round(rain * 100)))
+        self.sun[slot] = max(0, min(255, round(sun)))
+        self.wind[slot] = max(0, min(65535, round(wind * 10)))
+        self.humidity[slot] = max(0, min(255, round(humidity)))
+        self.count = slot + 1
+
+    def column(self, metric): # scaled integers, see METRICS
+        return getattr(self, metric)
+
+    def prepare(self, utc_offset, sunrise, sunset): # one pass per refresh: day/night/midnight/noon flags of every slot
+        # utc_offset in seconds (may be negative or not a whole hour), sunrise and sunset in UTC seconds
+        rise = (sunrise + utc_offset) % 86400 # seconds since local midnight
+        set_ = (sunset + utc_offset) % 86400
+        utc = self.utc
+        for slot in range(self.count):
+            local = utc[slot] + utc_offset
+            of_day = local % 86400
+            if rise <= set_:
+                flags = DAY if rise < of_day < set_ else 0
+            else: # daylight across local midnight
+                flags = DAY if of_day > rise or of_day < set_ else 0
+            following = utc[slot + 1] + utc_offset if slot + 1 < self.count else local + SLOT
+            if following // 86400 != local // 86400:
+                flags |= MIDNIGHT
+            elif of_day < 43200 <= following % 86400:
+                flags |= NOON
+            self.flags[slot] = flags
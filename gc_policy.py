@@ -0,0 +1,59 @@
+''' Garbage collection policy.
+Collects right before the allocation heavy phases (HTTP response, JSON parse) and right after redraws, leaves the
+rest to the gc.threshold() background collection and skips idle collections until idle_threshold bytes were allocated.
+'''
+
+import gc
+import time
+
+
+class GcPolicy:
+    def __init__(self, threshold=None, idle_threshold=0): # threshold: bytes allocated between automatic collections, None keeps the default
+        if threshold and hasattr(gc, 'threshold'): # CircuitPython and MicroPython only
+            gc.threshold(threshold)
+        self.threshold = threshold
+        self.idle_threshold = idle_threshold # bytes allocated since the last collection or sample() below which idle() skips
+        self.collections = {} # reason -> number of collections
+        self.skipped = 0 # idle collections skipped, less than idle_threshold was allocated
+        self.time = 0 # seconds spent in gc.collect()
+        self._start = time.monotonic()
+        self._allocated = gc.mem_alloc() # after the last collection
+
+    def collect(self, reason):
+        start = time.monotonic()
+        gc.collect()
+        self.time += time.monotonic() - start
+        self.collections[reason] = self.collections.get(reason, 0) + 1
+        self.sample()
+
+    def sample(self): # the heap use now is the idle baseline, e.g. after printing what a collection freed
+        self._allocated = gc.mem_alloc()
+
+    def idle(self): # periodic check, True if it collected. The floats of the periodic tasks alone stay below idle_threshold
+        if gc.mem_alloc() - self._allocated < self.idle_threshold:
+            self.skipped += 1
+            return False
+        self.collect('idle')
+        return True
+
+    def largest_free_block(self): # biggest bytearray that can be allocated, smaller than mem_free() when the heap is fragmented
+        low = 0
+        high = gc.mem_free()
+        while low < high: # binary search, every probe is garbage right away
+            size = (low + high + 1) // 2
+            try:
+                bytearray(size)
+                low = size
+            except MemoryError:
+                high = size - 1
+        return low
+
+    def report(self):
+        self.collect('report') # the probes of largest_free_block() must not count as allocated
+        hours = (time.monotonic() - self._start) / 3600
+        block = self.largest_free_block()
+        free = gc.mem_free()
+        print('GC: {} | idle skipped: {} | {:.2f}s total, {:.2f}s per hour | free: {:,} largest block: {:,} ({:.0f}%)'.format(
+            ' '.join('{}={}'.format(reason, count) for reason, count in self.collections.items()), self.skipped,
+            self.time, self.time / hours if hours else 0, free, block, 100 * block / free if free else 0))
+        gc.collect()
@@ -0,0 +1,64 @@
+''' Compact binary fonts made by tools/bdf2glyphs.py from the BDF fonts, restricted to the characters the station prints.
+The file is read in one go and every glyph bitmap is built at load, so no label waits for a glyph to be parsed.
+Layout (little endian): HEADER, count GLYPH records, then the rows of every glyph at 1 bit per pixel, each row padded to a byte.
+'''
+
+import struct
+
+MAGIC = b'GLF1'
+HEADER = '<4sHhhhh' # magic, glyph count, font bounding box: width, height, x offset, y offset
+GLYPH = '<HBBbbbbH' # code point, width, height, dx, dy, shift_x, shift_y, offset of the rows after the records
+
+# everything the labels print, 'M' is measured by adafruit_display_text to place the lines
+STATION_CHARACTERS = '0123456789-.:% CMkm/h'
+
+
+class GlyphFont:
+    ''' Same interface as the adafruit_bitmap_font fonts used by adafruit_display_text.label. '''
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            data = file.read() # one bulk read, the file is a few hundred bytes
+        import displayio
+        from fontio import Glyph
+        (magic, count, width, height, x, y) = struct.unpack_from(HEADER, data, 0)
+        if magic != MAGIC:
+            raise ValueError('Not a glyph font: ' + path)
+        self.path = path
+        self.size = len(data)
+        self._box = (width, height, x, y)
+        self._glyphs = {}
+        records = struct.calcsize(HEADER)
+        rows = records + count * struct.calcsize(GLYPH)
+        for i in range(count): # pre-warm: every glyph bitmap is built now
+            (code_point, width, height, dx, dy, shift_x, shift_y, offset) = struct.unpack_from(GLYPH, data, records + i * struct.calcsize(GLYPH))
+            bitmap = displayio.Bitmap(width, height, 2)
+            row_bytes = (width + 7) // 8
+            start = rows + offset
+            for y in range(height):
+                for x in range(width):
+                    if data[start + y * row_bytes + (x >> 3)] & (0x80 >> (x & 7)):
+                        bitmap[x, y] = 1
+            self._glyphs[code_point] = Glyph(bitmap, 0, width, height, dx, dy, shift_x, shift_y)
+
+    def get_bounding_box(self):
+        return self._box
+
+    def get_glyph(self, code_point):
+        return self._glyphs.get(code_point)
+
+    def load_glyphs(self, code_points): # every glyph of the file is loaded already
+        pass
+
+
+def load_font(base, characters=STATION_CHARACTERS): # base.glf if it has every character, base.bdf with characters loaded at once otherwise
+    try:
+        font = GlyphFont(base + '.glf')
+    except OSError:
+        font = None
+    if font and all(font.get_glyph(ord(character)) for character in characters):
+        return font
+    from adafruit_bitmap_font import bitmap_font # no .glf, or converted without some characters (bdf2glyphs.py --chars)
+    font = bitmap_font.load_font(base + '.bdf')
+    font.load_glyphs(characters) # one pass over the BDF now instead of one per label at the first update
+    return font
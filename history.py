@@ -0,0 +1,184 @@
+''' Ring buffer log of the observed CURRENT weather, in a fixed size file on the SD card.
+Fixed layout: HEADER, the hour INDEX, then capacity RECORDs, all little endian struct packed. The oldest records
+are overwritten once the file is full. Records are kept in RAM and written every batch records, one write per batch.
+The INDEX holds the number of the first record of each of the last INDEX_HOURS hours, so a window starting in them
+is read with one seek and one readinto() (two when it wraps around the end of the file).
+'''
+
+import array
+import struct
+
+MAGIC = b'WSH1'
+HEADER = '<4sHHll' # magic, record size, capacity, records appended since the file was created, newest indexed hour (UTC seconds // 3600)
+INDEX_HOURS = 48
+INDEX = '<{}l'.format(INDEX_HOURS) # number of the first record at or after each hour, by hour % INDEX_HOURS
+RECORD = '<lhBHBH'
+
+# column -> (array typecode, scale) of the RECORD fields, stored value = round(value * scale) like forecast.METRICS
+COLUMNS = (
+    ('utc', 'l', 1), # UTC seconds
+    ('temp', 'h', 10), # Celsius x10, int16
+    ('humidity', 'B', 1), # %, uint8
+    ('wind', 'H', 10), # wind speed x10, uint16
+    ('clouds', 'B', 1), # % of sky, uint8
+    ('pressure', 'H', 1), # hPa, uint16, 0 = unknown
+)
+
+_RECORD_SIZE = struct.calcsize(RECORD)
+_DATA = struct.calcsize(HEADER) + struct.calcsize(INDEX) # offset of slot 0
+
+
+def _clamp(value, scale, low, high):
+    return max(low, min(high, round((value or 0) * scale)))
+
+
+class History:
+    ''' append() the observations, read(start, end) a window of them back as typed arrays.
+    The file is only opened by flush() and read(), OSError is raised there when there is no SD card.
+    Record number n is in slot n % capacity, it is overwritten by record n + capacity.
+    '''
+
+    def __init__(self, path, capacity, batch=4):
+        self.path = path
+        self.capacity = capacity
+        self.batch = batch
+        self.size = _DATA + _RECORD_SIZE * capacity
+        self.appended = 0 # records written to the file, the last capacity of them are kept
+        self.hour = 0 # hour of the newest record in the index
+        self.index = array.array('l', [0] * INDEX_HOURS)
+        self.flushes = 0
+        self.lost = 0 # records dropped by a failed flush
+        self._loaded = False # header and index read from the file
+        self._pending = bytearray(_RECORD_SIZE * batch) # packed records not written yet
+        self._queued = 0
+
+    @property
+    def count(self): # records in the file
+        return min(self.appended, self.capacity)
+
+    def append(self, utc, temp, humidity, wind, clouds, pressure): # True if the batch was written
+        struct.pack_into(RECORD, self._pending, self._queued * _RECORD_SIZE, utc, _clamp(temp, 10, -32768, 32767),
+            _clamp(humidity, 1, 0, 255), _clamp(wind, 10, 0, 65535), _clamp(clouds, 1, 0, 255), _clamp(pressure, 1, 0, 65535))
+        self._queued += 1
+        if self._queued < self.batch:
+            return False
+        self.flush()
+        return True
+
+    def _load(self, file): # header and index into RAM, a missing or foreign file is recreated empty
+        header = bytearray(_DATA)
+        file.seek(0)
+        if file.readinto(header) == _DATA:
+            (magic, record_size, capacity, appended, hour) = struct.unpack_from(HEADER, header, 0)
+            if magic == MAGIC and record_size == _RECORD_SIZE and capacity == self.capacity and appended >= 0:
+                (self.appended, self.hour) = (appended, hour)
+                index = struct.unpack_from(INDEX, header, struct.calcsize(HEADER))
+                for hour in range(INDEX_HOURS):
+                    self.index[hour] = index[hour]
+                self._loaded = True
+                return
+        (self.appended, self.hour) = (0, 0)
+        self._write_header(file)
+        zeros = bytes(512)
+        remaining = self.size - _DATA
+        while remaining > 0: # allocated once, the file never grows afterwards
+            file.write(zeros[:min(remaining, 512)])
+            remaining -= 512
+        self._loaded = True
+
+    def _open(self):
+        try:
+            file = open(self.path, 'r+b')
+        except OSError: # first run, or the file was removed
+            file = open(self.path, 'w+b')
+            self._loaded = False
+        if not self._loaded:
+            self._load(file)
+        return file
+
+    def _write_header(self, file):
+        header = bytearray(_DATA)
+        struct.pack_into(HEADER, header, 0, MAGIC, _RECORD_SIZE, self.capacity, self.appended, self.hour)
+        struct.pack_into(INDEX, header, struct.calcsize(HEADER), *self.index)
+        file.seek(0)
+        file.write(header)
+
+    def _index(self, utc, number): # first record of its hour and of the empty hours before it
+        hour = utc // 3600
+        if number == 0:
+            first = hour - INDEX_HOURS + 1
+        elif hour > self.hour:
+            first = max(self.hour + 1, hour - INDEX_HOURS + 1)
+        else: # same hour, or the clock went back: the index keeps the earlier records
+            return
+        for indexed in range(first, hour + 1):
+            self.index[indexed % INDEX_HOURS] = number
+        self.hour = hour
+
+    def flush(self): # write the queued records then the header, the queue is emptied even if it fails
+        if not self._queued:
+            return
+        queued = self._queued
+        self._queued = 0
+        try:
+            with self._open() as file:
+                pending = memoryview(self._pending)
+                written = 0
+                while written < queued: # a batch that wraps around the end of the file is written in two parts
+                    slot = self.appended % self.capacity
+                    part = min(queued - written, self.capacity - slot)
+                    for i in range(written, written + part):
+                        self._index(struct.unpack_from('<l', pending, i * _RECORD_SIZE)[0], self.appended + i - written)
+                    file.seek(_DATA + slot * _RECORD_SIZE)
+                    file.write(pending[written * _RECORD_SIZE:(written + part) * _RECORD_SIZE])
+                    self.appended += part
+                    written += part
+                self._write_header(file)
+        except OSError:
+            self._loaded = False # read back from the file next time
+            self.lost += queued
+            raise
+        self.flushes += 1
+
+    def _first(self, start): # number of the first record that can be at or after start
+        hour = start // 3600
+        if hour > self.hour:
+            return self.appended
+        oldest = self.appended - self.count
+        if hour <= self.hour - INDEX_HOURS: # before the index
+            return oldest
+        return max(oldest, self.index[hour % INDEX_HOURS]) # the hour may be overwritten already
+
+    def read(self, start, end=None): # records with start <= utc <= end as {column: array of scaled integers}, see COLUMNS
+        self.flush()
+        with self._open() as file:
+            first = self._first(start)
+            count = self.appended - first
+            slot = first % self.capacity
+            buf = bytearray(count * _RECORD_SIZE)
+            part = min(count, self.capacity - slot)
+            file.seek(_DATA + slot * _RECORD_SIZE)
+            file.readinto(memoryview(buf)[:part * _RECORD_SIZE])
+            if part < count: # wrapped around the end of the file
+                file.seek(_DATA)
+                file.readinto(memoryview(buf)[part * _RECORD_SIZE:])
+        columns = [array.array(typecode, [0] * count) for (name, typecode, scale) in COLUMNS]
+        found = 0
+        for i in range(count):
+            record = struct.unpack_from(RECORD, buf, i * _RECORD_SIZE)
+            utc = record[0]
+            if utc < start: # the rest of the first hour
+                continue
+            if end is not None and utc > end:
+                break
+            for column in range(len(COLUMNS)):
+                columns[column][found] = record[column]
+            found += 1
+        window = {}
+        for column in range(len(COLUMNS)):
+            window[COLUMNS[column][0]] = columns[column][:found] if found < count else columns[column]
+        return window
+
+    def report(self):
+        print('History {}: {} of {} records | flushes: {} | queued: {} | lost: {}'.format(
+            self.path, self.count, self.capacity, self.flushes, self._queued, self.lost))
@@ -0,0 +1,36 @@
+''' CPython stand-ins for the PyPortal, to run and benchmark code_v3.py on a computer.
+host/lib holds modules named like the CircuitPython ones (board, displayio, rtc, adafruit_requests...),
+HTTP answers come from the recorded responses in host/fixtures.
+Usage: python3 -m host.bench_station, or host.install() then host.station.boot() from your own script.
+'''
+
+import gc
+import os
+import sys
+import time
+
+LIB = os.path.join(os.path.dirname(__file__), 'lib')
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+HEAP_SIZE = 192 * 1024 # bytes of RAM of the PyPortal SAMD51, gc.mem_free() is counted from it
+
+_installed = False
+
+
+def _mem_alloc(): # bytes traced by tracemalloc, 0 when it is not running
+    import tracemalloc
+    if not tracemalloc.is_tracing():
+        return 0
+    return tracemalloc.get_traced_memory()[0]
+
+
+def install(): # put the stand-ins first on sys.path and add the CircuitPython only gc and time behaviour
+    global _installed
+    if _installed:
+        return
+    sys.path.insert(0, LIB)
+    import rtc
+    gc.mem_alloc = _mem_alloc
+    gc.mem_free = lambda: max(0, HEAP_SIZE - _mem_alloc())
+    time.time = rtc.now # follows rtc.RTC().datetime like the board clock
+    time.localtime = rtc.localtime # no timezone on the board, the RTC keeps local time
+    _installed = True
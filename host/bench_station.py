@@ -0,0 +1,109 @@
+''' Host benchmark of the station update functions: wall time, pixel writes and peak allocations per call.
+Run from the repository root: python3 -m host.bench_station [--rounds N] [--save FILE] [--compare FILE]
+--save writes the results as JSON, --compare prints the change against such a file to spot regressions.
+The forecast alternates between two recorded responses one slot apart, so every call downloads and redraws. The charts
+are double buffered, so the responses change every other round: each buffer gets a different forecast than it holds.
+'''
+
+import argparse
+import contextlib
+import io
+import json
+import time
+import tracemalloc
+from host import station as host_station
+
+
+def _calls(station, rounds): # (name, [one callable per round]), of the home location
+    home = station['home']
+    requests = station['requests']
+
+    def forecast(fixture):
+        def call():
+            requests.set_fixture('/data/2.5/forecast', fixture)
+            station['forecast_cache'].forget(home.forecast_url) # the benchmark wants the download path, not a cache hit
+            station['update_forecast'](home)
+        return call
+
+    def updatebar(percent):
+        return lambda: station['update_updatebar'](percent)
+
+    with contextlib.redirect_stdout(io.StringIO()): # the boot drew one chart buffer, the rounds measure incremental redraws of both
+        forecast('forecast.json')()
+    return (
+        ('update_forecast', [forecast('forecast_next.json' if i // 2 % 2 == 0 else 'forecast.json') for i in range(rounds)]),
+        ('update_current_weather', [lambda: station['update_current_weather'](home)] * rounds),
+        ('update_displayed_time', [station['update_displayed_time']] * rounds),
+        ('update_updatebar', [updatebar(i * 7 % 101) for i in range(rounds)]),
+    )
+
+
+def _measure(calls, displayio): # [(wall seconds, pixel writes)], [peak bytes] of each call
+    timings = []
+    for call in calls:
+        pixel_writes = displayio.pixel_writes
+        start = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - start, displayio.pixel_writes - pixel_writes))
+    peaks = []
+    tracemalloc.start() # separate pass, tracing slows the calls down
+    for call in calls:
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        call()
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+    return timings, peaks
+
+
+def run(rounds):
+    station = host_station.boot()
+    import displayio
+    results = {}
+    for name, calls in _calls(station, rounds):
+        with contextlib.redirect_stdout(io.StringIO()):
+            timings, peaks = _measure(calls, displayio)
+        walls = [wall for wall, _ in timings]
+        results[name] = {
+            'wall_ms': 1000 * sum(walls) / len(walls),
+            'wall_max_ms': 1000 * max(walls),
+            'pixel_writes': sum(pixels for _, pixels in timings) / len(timings),
+            'peak_alloc': max(peaks),
+        }
+    return results
+
+
+def report(results, baseline=None):
+    print('-'*40)
+    print('Station benchmark on the host')
+    print('-'*40, '\n')
+    for name, result in results.items():
+        line = '{:24s} wall: {:7.2f} ms (max {:7.2f}) | pixel writes: {:8.0f} | peak alloc: {:8,} bytes'.format(
+            name, result['wall_ms'], result['wall_max_ms'], result['pixel_writes'], result['peak_alloc'])
+        if baseline and name in baseline:
+            before = baseline[name]
+            line += ' | vs baseline: wall {:+.0f}% pixels {:+.0f} alloc {:+,}'.format(
+                100 * (result['wall_ms'] / before['wall_ms'] - 1) if before['wall_ms'] else 0,
+                result['pixel_writes'] - before['pixel_writes'], result['peak_alloc'] - before['peak_alloc'])
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rounds', type=int, default=20, help='calls of each function')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of a previous --save to compare with')
+    args = parser.parse_args()
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    results = run(args.rounds)
+    report(results, baseline)
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=1)
+
+
+if __name__ == '__main__':
+    main()
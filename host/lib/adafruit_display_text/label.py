@@ -0,0 +1,27 @@
+''' Stand-in for adafruit_display_text.label (version 2 API, with max_glyphs). Text is kept, not rendered. '''
+
+
+class Label:
+    def __init__(self, font, *, text='', color=0xFFFFFF, max_glyphs=None, x=0, y=0, **kwargs):
+        if max_glyphs is None:
+            max_glyphs = len(text)
+        self.font = font
+        self.color = color
+        self.max_glyphs = max_glyphs
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self.text_changes = 0
+        self._text = ''
+        self.text = text
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        if len(text) > self.max_glyphs:
+            raise RuntimeError('Text length exceeds max_glyphs')
+        self._text = text
+        self.text_changes += 1
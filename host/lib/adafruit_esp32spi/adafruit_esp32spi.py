@@ -0,0 +1,43 @@
+''' Stand-in for the ESP32 WiFi coprocessor driver. Always finds the access point unless connect_failures is set. '''
+
+import rtc
+
+WL_IDLE_STATUS = 0
+WL_CONNECTED = 3
+
+connect_failures = 0 # connect_AP() calls that raise before one succeeds
+
+
+class ESP_SPIcontrol:
+    def __init__(self, spi, cs_pin, ready_pin, reset_pin, gpio0_pin=None, *, debug=False):
+        self.is_connected = False
+        self.status = WL_IDLE_STATUS
+        self.ssid = b''
+        self.rssi = -45
+        self.ip_address = bytes((192, 168, 1, 42))
+        self.connects = 0
+        self.resets = 0
+
+    def connect_AP(self, ssid, password, timeout_s=10):
+        global connect_failures
+        if connect_failures > 0:
+            connect_failures -= 1
+            raise RuntimeError('No such ssid', ssid)
+        self.ssid = bytes(ssid, 'utf-8')
+        self.is_connected = True
+        self.status = WL_CONNECTED
+        self.connects += 1
+        return self.status
+
+    def reset(self):
+        self.is_connected = False
+        self.status = WL_IDLE_STATUS
+        self.resets += 1
+
+    def pretty_ip(self, ip):
+        return '.'.join(str(byte) for byte in ip)
+
+    def get_time(self): # (seconds, fraction) of the host clock, like nina-fw once NTP answered
+        if not self.is_connected:
+            raise ValueError('_get_time returned 0')
+        return (int(rtc._time()), 0)
@@ -0,0 +1,11 @@
+''' Stand-in for the ESP32 socket module, adafruit_requests only needs set_interface(). '''
+
+AF_INET = 2
+SOCK_STREAM = 1
+
+_the_interface = None
+
+
+def set_interface(iface):
+    global _the_interface
+    _the_interface = iface
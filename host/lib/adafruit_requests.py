@@ -0,0 +1,102 @@
+''' Stand-in for adafruit_requests, answers from the recorded responses in host/fixtures.
+ROUTES picks the fixture by URL, set_fixture() swaps one (e.g. a later forecast) and fail() injects errors.
+Like adafruit_requests >= 1.6, sockets stay open per host in _default_session._open_sockets.
+'''
+
+import os
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'fixtures')
+DATE = 'Sun, 13 Sep 2020 05:05:12 GMT' # when the fixtures were recorded
+
+# (part of the URL, fixture file), first match wins
+ROUTES = [
+    ('/data/2.5/forecast', 'forecast.json'),
+    ('/data/2.5/weather', 'current.json'),
+    ('/data/2.5/onecall', 'onecall.json'),
+    ('io.adafruit.com', 'time.txt'),
+]
+
+requests_made = [] # URLs in request order
+bytes_served = 0
+_failures = []
+
+
+def set_fixture(url_part, name): # serve the fixture name for URLs containing url_part
+    for i, (part, _) in enumerate(ROUTES):
+        if part == url_part:
+            ROUTES[i] = (url_part, name)
+            return
+    ROUTES.insert(0, (url_part, name))
+
+
+def fail(count, error=None): # the next count requests raise error, like a dropped ESP32 link
+    _failures.extend([error or RuntimeError('Failed to request hostname')] * count)
+
+
+class Response:
+    def __init__(self, body, status_code=200, headers=None):
+        self._body = body
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    @property
+    def content(self):
+        return self._body
+
+    @property
+    def text(self):
+        return str(self._body, 'utf-8')
+
+    def json(self):
+        import json
+        return json.loads(self._body)
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        for i in range(0, len(self._body), chunk_size):
+            yield self._body[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+
+class Session:
+    def __init__(self):
+        self._open_sockets = {} # (host, port, proto) -> socket
+
+    def _close_socket(self, sock):
+        for key in [key for key in self._open_sockets if self._open_sockets[key] is sock]:
+            del self._open_sockets[key]
+
+    def request(self, method, url, data=None, json=None, headers=None, stream=False, timeout=60):
+        global bytes_served
+        requests_made.append(url)
+        if _failures:
+            raise _failures.pop(0)
+        (proto, _, host) = url.split('/')[:3]
+        key = (host, 443 if proto == 'https:' else 80, proto)
+        if key not in self._open_sockets:
+            self._open_sockets[key] = object()
+        for (part, name) in ROUTES:
+            if part in url:
+                with open(os.path.join(FIXTURES, name), 'rb') as file:
+                    body = file.read()
+                bytes_served += len(body)
+                return Response(body, 200, {'Date': DATE, 'Content-Length': str(len(body))})
+        return Response(b'{"cod": "404", "message": "no fixture for this URL"}', 404, {'Date': DATE})
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+
+_default_session = None
+
+
+def set_socket(sock, iface=None):
+    global _default_session
+    _default_session = Session()
+    if iface:
+        sock.set_interface(iface)
+
+
+def get(url, **kwargs):
+    return _default_session.get(url, **kwargs)
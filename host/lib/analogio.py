@@ -0,0 +1,15 @@
+''' Stand-in for the CircuitPython analogio module. AnalogIn.value is light_level unless set on the instance. '''
+
+light_level = 20000 # 16 bit reading, about indoor light on the PyPortal sensor
+
+
+class AnalogIn:
+    def __init__(self, pin):
+        self.pin = pin
+
+    @property
+    def value(self):
+        return light_level
+
+    def deinit(self):
+        pass
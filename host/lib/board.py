@@ -0,0 +1,24 @@
+''' Stand-in for the PyPortal board module: the pins are placeholders, DISPLAY is a 320x240 displayio.Display. '''
+
+import displayio
+
+
+class _Pin:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return 'board.' + self.name
+
+
+ESP_CS = _Pin('ESP_CS')
+ESP_BUSY = _Pin('ESP_BUSY')
+ESP_RESET = _Pin('ESP_RESET')
+SCK = _Pin('SCK')
+MOSI = _Pin('MOSI')
+MISO = _Pin('MISO')
+LIGHT = _Pin('LIGHT')
+SD_CS = _Pin('SD_CS')
+SPEAKER_ENABLE = _Pin('SPEAKER_ENABLE')
+
+DISPLAY = displayio.Display(320, 240)
@@ -0,0 +1,9 @@
+''' Stand-in for the CircuitPython busio module. '''
+
+
+class SPI:
+    def __init__(self, clock, MOSI=None, MISO=None):
+        self.clock = clock
+
+    def deinit(self):
+        pass
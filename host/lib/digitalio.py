@@ -0,0 +1,16 @@
+''' Stand-in for the CircuitPython digitalio module. '''
+
+
+class DigitalInOut:
+    def __init__(self, pin):
+        self.pin = pin
+        self.value = False
+
+    def switch_to_output(self, value=False, drive_mode=None):
+        self.value = value
+
+    def switch_to_input(self, pull=None):
+        pass
+
+    def deinit(self):
+        pass
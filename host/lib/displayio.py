@@ -0,0 +1,166 @@
+''' Stand-in for the CircuitPython displayio module.
+Bitmap pixels are a NumPy array when NumPy is installed, a bytearray otherwise. Every pixel write is counted.
+'''
+
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+pixel_writes = 0 # pixels written in every Bitmap since start
+
+
+class Bitmap:
+    def __init__(self, width, height, value_count):
+        self.width = width
+        self.height = height
+        self.value_count = value_count
+        self.writes = 0 # pixels written in this bitmap
+        if numpy is not None:
+            self._pixels = numpy.zeros(width * height, dtype=numpy.uint8 if value_count <= 256 else numpy.uint16)
+        else:
+            self._pixels = bytearray(width * height) # only up to 256 colors
+
+    def _index(self, key): # bitmap[x, y] or bitmap[index]
+        if isinstance(key, tuple):
+            (x, y) = key
+            if not (0 <= x < self.width and 0 <= y < self.height):
+                raise IndexError('pixel coordinates out of bounds')
+            return y * self.width + x
+        if not 0 <= key < self.width * self.height:
+            raise IndexError('pixel index out of bounds')
+        return key
+
+    def __getitem__(self, key):
+        return int(self._pixels[self._index(key)])
+
+    def __setitem__(self, key, value):
+        global pixel_writes
+        if not 0 <= value < self.value_count:
+            raise ValueError('pixel value requires too many bits')
+        self._pixels[self._index(key)] = value
+        self.writes += 1
+        pixel_writes += 1
+
+    def fill(self, value):
+        global pixel_writes
+        if numpy is not None:
+            self._pixels.fill(value)
+        else:
+            self._pixels[:] = bytes((value,)) * len(self._pixels)
+        self.writes += len(self._pixels)
+        pixel_writes += len(self._pixels)
+
+    def tobytes(self): # pixel values row by row, to compare two renders
+        return bytes(self._pixels)
+
+
+class Palette:
+    def __init__(self, color_count):
+        self._colors = [0] * color_count
+        self._transparent = set()
+
+    def __len__(self):
+        return len(self._colors)
+
+    def __getitem__(self, index):
+        return self._colors[index]
+
+    def __setitem__(self, index, color):
+        self._colors[index] = color
+
+    def make_transparent(self, index):
+        self._transparent.add(index)
+
+    def make_opaque(self, index):
+        self._transparent.discard(index)
+
+
+class TileGrid:
+    def __init__(self, bitmap, pixel_shader=None, width=1, height=1, tile_width=None, tile_height=None, default_tile=0, x=0, y=0):
+        self.bitmap = bitmap
+        self.pixel_shader = pixel_shader
+        self.x = x
+        self.y = y
+        self.hidden = False
+
+
+class Group:
+    def __init__(self, max_size=4, scale=1, x=0, y=0):
+        self.max_size = max_size
+        self.scale = scale
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self._layers = []
+
+    def _check(self, layer):
+        if len(self._layers) >= self.max_size:
+            raise RuntimeError('Group full')
+        if layer in self._layers:
+            raise ValueError('Layer already in a group.')
+
+    def append(self, layer):
+        self._check(layer)
+        self._layers.append(layer)
+
+    def insert(self, index, layer):
+        self._check(layer)
+        self._layers.insert(index, layer)
+
+    def index(self, layer):
+        return self._layers.index(layer)
+
+    def pop(self, index=-1):
+        return self._layers.pop(index)
+
+    def remove(self, layer):
+        self._layers.remove(layer)
+
+    def __len__(self):
+        return len(self._layers)
+
+    def __getitem__(self, index):
+        return self._layers[index]
+
+    def __setitem__(self, index, layer):
+        self._layers[index] = layer
+
+    def __contains__(self, layer):
+        return layer in self._layers
+
+
+class Display:
+    ''' Counts the refreshes instead of sending pixels to a screen. '''
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.brightness = 1.0
+        self.auto_refresh = True
+        self.root_group = None
+        self.refreshes = 0
+        self.shows = 0
+        self._last_call = None # time.monotonic() of the last refresh() call
+
+    def show(self, group):
+        self.root_group = group
+        self.shows += 1
+
+    def refresh(self, *, target_frames_per_second=60, minimum_frames_per_second=1):
+        # CircuitPython 6: the target is an int, and a call later than one target frame after the previous one is skipped
+        if not isinstance(target_frames_per_second, int):
+            raise TypeError("can't convert NoneType to int")
+        now = time.monotonic()
+        late = self._last_call is not None and now - self._last_call > 1 / target_frames_per_second
+        self._last_call = now
+        if late:
+            return False
+        self.refreshes += 1
+        return True
+
+
+def release_displays():
+    pass
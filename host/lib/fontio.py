@@ -0,0 +1,5 @@
+''' Stand-in for the CircuitPython fontio module. '''
+
+from collections import namedtuple
+
+Glyph = namedtuple('Glyph', ('bitmap', 'tile_index', 'width', 'height', 'dx', 'dy', 'shift_x', 'shift_y'))
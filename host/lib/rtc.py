@@ -0,0 +1,27 @@
+''' Stand-in for the CircuitPython rtc module. Setting RTC().datetime moves the clock returned by now(). '''
+
+import calendar
+import time
+
+_time = time.time
+_gmtime = time.gmtime
+_offset = 0 # seconds between the emulated board clock and the host clock
+
+
+def now():
+    return int(_time()) + _offset
+
+
+def localtime(seconds=None):
+    return _gmtime(now() if seconds is None else seconds)
+
+
+class RTC:
+    @property
+    def datetime(self):
+        return localtime()
+
+    @datetime.setter
+    def datetime(self, value):
+        global _offset
+        _offset = calendar.timegm(tuple(value)) - int(_time())
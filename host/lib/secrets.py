@@ -0,0 +1,9 @@
+# placeholder keys, the stand-in adafruit_requests never sends them anywhere
+secrets = {
+    'ssid': 'host',
+    'password': 'host',
+    'aio_username': 'host',
+    'aio_key': 'host',
+    'timezone': 'Asia/Tokyo',
+    'openweather_token': 'host',
+}
@@ -0,0 +1,8 @@
+''' Stand-in for the part of the Adafruit simpleio library the station uses. '''
+
+
+def map_range(x, in_min, in_max, out_min, out_max):
+    mapped = (x - in_min) * (out_max - out_min) / (in_max - in_min) + out_min
+    if out_min <= out_max:
+        return max(min(mapped, out_max), out_min)
+    return min(max(mapped, out_max), out_min)
@@ -0,0 +1,42 @@
+''' Runs code_v3.py on the host until its main loop goes to sleep for longer than request_gap.
+Sleeps before the main loop return at once, the short ones of the main loop (between two network requests) are slept.
+The boot, the first run of every task due at once included, is the unmodified script. Its globals are returned so the
+update functions can be called again, e.g. station['update_forecast'](station['home']).
+'''
+
+import contextlib
+import io
+import os
+import time
+import host
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'code_v3.py')
+
+
+class _MainLoop(Exception):
+    pass
+
+
+def boot(script=SCRIPT, quiet=True): # globals of script, quiet hides what the script prints
+    host.install()
+    with open(script) as file:
+        code = compile(file.read(), script, 'exec')
+    station = {'__name__': '__main__', '__file__': script}
+
+    def stop(seconds): # the scheduler exists once the main loop is reached
+        if 'scheduler' not in station:
+            return
+        if seconds > station['request_gap']:
+            raise _MainLoop()
+        sleep(seconds)
+
+    sleep = time.sleep
+    time.sleep = stop
+    try:
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            exec(code, station)
+    except _MainLoop:
+        pass
+    finally:
+        time.sleep = sleep
+    return station
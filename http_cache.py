@@ -0,0 +1,67 @@
+''' Response cache keyed by URL.
+Only the validators and the expiry of each response are kept, the parsed data lives with the caller.
+Fresh entries skip the request, stale ones are revalidated with If-None-Match / If-Modified-Since.
+'''
+
+
+def header(headers, name): # case insensitive lookup, header names are not normalised by every requests version
+    name = name.lower()
+    for key in headers:
+        if key.lower() == name:
+            return headers[key]
+    return None
+
+
+class ResponseCache:
+    def __init__(self):
+        self._entries = {} # url -> [etag, last_modified, expires, size]
+        self.hits = 0 # served without any request
+        self.not_modified = 0 # 304 answers to a conditional request
+        self.misses = 0 # full downloads
+        self.bytes_saved = 0
+
+    def fresh(self, url, now): # True if the cached data of url is still valid at now (seconds since epoch)
+        entry = self._entries.get(url)
+        if entry is None or entry[2] is None or now >= entry[2]:
+            return False
+        self.hits += 1
+        self.bytes_saved += entry[3]
+        return True
+
+    def request_headers(self, url): # conditional request headers for url, empty if the server gave no validators
+        entry = self._entries.get(url)
+        headers = {}
+        if entry is None:
+            return headers
+        if entry[0]:
+            headers['If-None-Match'] = entry[0]
+        if entry[1]:
+            headers['If-Modified-Since'] = entry[1]
+        return headers
+
+    def revalidated(self, url, expires=None): # the server answered 304, keep the data and extend the expiry
+        entry = self._entries[url]
+        if expires is not None:
+            entry[2] = expires
+        self.not_modified += 1
+        self.bytes_saved += entry[3]
+
+    def store(self, url, headers, size, expires): # record the validators of a full response
+        self._entries[url] = [header(headers, 'ETag'), header(headers, 'Last-Modified'), expires, size]
+        self.misses += 1
+
+    def entry(self, url): # (etag, last_modified, expires, size) of url or None, to keep it across a restart
+        entry = self._entries.get(url)
+        return tuple(entry) if entry else None
+
+    def restore(self, url, entry): # put back an entry(), counted neither as a hit nor as a download
+        self._entries[url] = list(entry)
+
+    def forget(self, url):
+        self._entries.pop(url, None)
+
+    def report(self):
+        requests = self.hits + self.not_modified + self.misses
+        hit_rate = 100 * (self.hits + self.not_modified) / requests if requests else 0
+        print('Cache hits: {} | 304: {} | downloads: {} | hit rate: {:.0f}% | bytes saved: {:,}'.format(
+            self.hits, self.not_modified, self.misses, hit_rate, self.bytes_saved))
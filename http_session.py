@@ -0,0 +1,66 @@
+''' Keep-alive wrapper around adafruit_requests.
+Consecutive requests to the same host reuse one ESP32 socket: no new DNS lookup, TCP connect or teardown.
+Needs adafruit_requests >= 1.6 (Session with a socket pool), older versions open a socket per request as before.
+'''
+
+import time
+
+
+def _host(url):
+    return url.split('/')[2]
+
+
+class KeepAliveSession:
+    def __init__(self, requests):
+        self._requests = requests
+        self._session = getattr(requests, '_default_session', None) # created by requests.set_socket()
+        self.connects = 0 # requests that had to open a socket
+        self.reuses = 0 # requests sent on an open socket
+        self.reconnects = 0 # dead sockets detected and replaced
+        self.requests = 0
+        self.request_time = 0 # seconds spent in get(), until the response headers are read
+
+    def _open_sockets(self, host): # sockets of the pool connected to host
+        pool = getattr(self._session, '_open_sockets', None)
+        if not pool:
+            return []
+        return [pool[key] for key in pool if key[0] == host]
+
+    def _close(self, sockets):
+        for sock in sockets:
+            try:
+                self._session._close_socket(sock)
+            except Exception:
+                pass # socket already gone with the ESP32 reset
+
+    def get(self, url, **kwargs):
+        start = time.monotonic()
+        host = _host(url)
+        sockets = self._open_sockets(host)
+        try:
+            response = self._requests.get(url, **kwargs)
+        except (OSError, RuntimeError, ValueError):
+            if not sockets:
+                raise
+            # the kept socket was closed by the server or dropped by the link, reconnect once transparently
+            self._close(self._open_sockets(host))
+            self.reconnects += 1
+            sockets = []
+            response = self._requests.get(url, **kwargs)
+        if sockets:
+            self.reuses += 1
+        else:
+            self.connects += 1
+        self.requests += 1
+        self.request_time += time.monotonic() - start
+        return response
+
+    def forget(self): # call after esp.reset(), every open socket is dead
+        pool = getattr(self._session, '_open_sockets', None)
+        if pool:
+            self._close(list(pool.values()))
+
+    def report(self):
+        average = 1000 * self.request_time / self.requests if self.requests else 0
+        print('HTTP requests: {} | connects: {} | reuses: {} | reconnects: {} | average latency: {:.0f} ms'.format(
+            self.requests, self.connects, self.reuses, self.reconnects, average))
@@ -0,0 +1,50 @@
+''' Per-location state of the station.
+Every location keeps its last fetched data and its own forecast chart bitmaps, drawn when its forecast changes,
+so showing another location only swaps the chart layer and the label texts. The charts are double buffered with a
+single spare set shared by all the locations: a refresh draws the spare while the front charts are on screen, then
+swap_buffers() takes it and hands the old front charts back as the next spare, N + 1 bitmaps for N locations.
+'''
+
+from forecast import ForecastSeries
+
+
+class Location:
+    ''' What was fetched for one location. The station sets the display objects, URLs, retry policies and files. '''
+
+    def __init__(self, index, name, city_id, lat, lon, tz_offset, slots):
+        self.index = index # in the station location list
+        self.name = name
+        self.city_id = city_id # OpenWeatherMap city id
+        self.lat = lat
+        self.lon = lon
+        self.utc_offset = tz_offset * 3600 # seconds, replaced by the offset the weather API returns
+        self.sunrise = 0 # UTC seconds
+        self.sunset = 0
+        self.current = None # (temp, humidity, wind) of the last CURRENT weather
+        self.current_old = False # restored CURRENT weather older than an update period, shown stale until the next update
+        self.forecast_series = ForecastSeries(slots) # drawn on the chart bitmap
+        self.spare_series = ForecastSeries(slots) # refilled by an update, then swapped with forecast_series
+        self.clipped_bars = 0 # values outside their scale in the last redraw
+        self.bitmap = None # forecast charts on screen, drawn by canvas and shown by tile_grid
+        self.canvas = None
+        self.tile_grid = None
+        self.current_url = None
+        self.forecast_url = None
+        self.combined_url = None
+        self.current_retry = None
+        self.forecast_retry = None
+        self.forecast_task = None # scheduler Task of its FORECASTS
+        self.last_state = None # Snapshot
+        self.history = None # History
+
+    def swap_series(self): # the refilled spare becomes the drawn forecast, the old one is reused next time
+        self.forecast_series, self.spare_series = self.spare_series, self.forecast_series
+
+    def swap_buffers(self, spare): # spare: drawn (bitmap, canvas, tile_grid), they become the front ones. Returns the old front, the next spare
+        front = (self.bitmap, self.canvas, self.tile_grid)
+        (self.bitmap, self.canvas, self.tile_grid) = spare
+        return front
+
+    def local_hour_minute(self, utc): # (hour, minute) at the location, works for negative and non whole hour offsets
+        of_day = (utc + self.utc_offset) % 86400
+        return of_day // 3600, of_day % 3600 // 60
@@ -0,0 +1,314 @@
+''' Streaming reader for OpenWeatherMap JSON responses.
+Reads the response in fixed-size chunks and keeps only the requested fields, so peak RAM scales with
+the chunk size and not with the size of the document. Reading stops as soon as the wanted items are found.
+Usage: parse_forecast(JsonStream(response.iter_content(chunk_size=JSON_CHUNK_SIZE)), count)
+'''
+
+JSON_CHUNK_SIZE = 256 # bytes read from the socket at once
+
+# fields are paths into the JSON document, values are returned in the same order (None if missing)
+FORECAST_FIELDS = (
+    ('dt',),
+    ('weather', 0, 'icon'),
+    ('main', 'temp'),
+    ('main', 'humidity'),
+    ('rain', '3h'),
+    ('clouds', 'all'),
+    ('wind', 'speed'),
+)
+
+CURRENT_FIELDS = (
+    ('weather', 0, 'description'),
+    ('main', 'temp'),
+    ('main', 'humidity'),
+    ('wind', 'speed'),
+    ('sys', 'sunrise'),
+    ('sys', 'sunset'),
+    ('timezone',), # UTC offset of the location in seconds
+    ('clouds', 'all'),
+    ('main', 'pressure'),
+)
+
+# One Call: current conditions and hourly forecast in one document
+ONECALL_CURRENT_FIELDS = (
+    ('weather', 0, 'description'),
+    ('temp',),
+    ('humidity',),
+    ('wind_speed',),
+    ('sunrise',),
+    ('sunset',),
+    ('clouds',),
+    ('pressure',),
+)
+
+ONECALL_HOURLY_FIELDS = ( # same order as FORECAST_FIELDS, rain is per hour
+    ('dt',),
+    ('weather', 0, 'icon'),
+    ('temp',),
+    ('humidity',),
+    ('rain', '1h'),
+    ('clouds',),
+    ('wind_speed',),
+)
+
+# fields without which a document is not used, ValueError if one is missing. The others may be None
+FORECAST_REQUIRED = (('dt',), ('main', 'temp'))
+CURRENT_REQUIRED = (('main', 'temp'), ('main', 'humidity'), ('wind', 'speed'), ('sys', 'sunrise'), ('sys', 'sunset'))
+ONECALL_CURRENT_REQUIRED = (('temp',), ('humidity',), ('wind_speed',), ('sunrise',), ('sunset',))
+ONECALL_HOURLY_REQUIRED = (('dt',), ('temp',))
+
+_WHITESPACE = b' \t\r\n'
+_NUMBER_END = b' \t\r\n,]}'
+
+
+def _prefixes(fields): # every partial path that leads to a wanted field
+    prefixes = set()
+    for path in fields:
+        for i in range(1, len(path)):
+            prefixes.add(path[:i])
+    return prefixes
+
+
+class JsonStream:
+    ''' Pull scanner over an iterator of byte chunks. Only one chunk is held at a time. '''
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buf = b''
+        self._pos = 0
+        self.bytes_read = 0
+
+    def _fill(self): # load the next chunk once the current one is consumed
+        while self._pos >= len(self._buf):
+            try:
+                self._buf = next(self._chunks)
+            except StopIteration:
+                raise ValueError('syntax error in JSON: unexpected end of data')
+            self._pos = 0
+            self.bytes_read += len(self._buf)
+
+    def _next(self): # next significant byte, skipping whitespace
+        while True:
+            self._fill()
+            c = self._buf[self._pos]
+            self._pos += 1
+            if c not in _WHITESPACE:
+                return c
+
+    def _peek(self):
+        c = self._next()
+        self._pos -= 1
+        return c
+
+    def _expect(self, char):
+        c = self._next()
+        if c != ord(char):
+            raise ValueError('syntax error in JSON: expected ' + char + ' got ' + chr(c))
+
+    def _string(self, keep=True): # read a string, opening quote already consumed
+        out = bytearray() if keep else None
+        while True:
+            self._fill()
+            buf = self._buf
+            end = self._pos
+            while end < len(buf) and buf[end] != 0x22 and buf[end] != 0x5C: # " and \
+                end += 1
+            if keep:
+                out.extend(buf[self._pos:end])
+            self._pos = end
+            if end == len(buf):
+                continue
+            self._pos += 1
+            if buf[end] == 0x22:
+                return str(out, 'utf-8') if keep else None
+            self._fill() # escaped character
+            c = self._buf[self._pos]
+            self._pos += 1
+            if keep:
+                if c == 0x75: # \uXXXX, kept as '?' since the display fonts have no such glyphs
+                    for _ in range(4):
+                        self._fill()
+                        self._pos += 1
+                    out.append(0x3F)
+                else:
+                    out.append({0x6E: 0x0A, 0x74: 0x09, 0x72: 0x0D, 0x62: 0x08, 0x66: 0x0C}.get(c, c))
+            elif c == 0x75:
+                for _ in range(4):
+                    self._fill()
+                    self._pos += 1
+
+    def _scalar(self, first): # number, true, false or null, first byte already consumed
+        out = bytearray((first,))
+        while True:
+            self._fill()
+            c = self._buf[self._pos]
+            if c in _NUMBER_END:
+                break
+            out.append(c)
+            self._pos += 1
+        text = str(out, 'ascii')
+        if text == 'true':
+            return True
+        if text == 'false':
+            return False
+        if text == 'null':
+            return None
+        if '.' in text or 'e' in text or 'E' in text:
+            return float(text)
+        return int(text)
+
+    def skip(self): # skip the next value without keeping any of it
+        depth = 0
+        while True:
+            c = self._next()
+            if c == 0x22:
+                self._string(False)
+            elif c == 0x7B or c == 0x5B: # { [
+                depth += 1
+            elif c == 0x7D or c == 0x5D: # } ]
+                depth -= 1
+            elif depth == 0:
+                self._scalar(c)
+            if depth == 0:
+                return
+
+    def members(self): # iterate the keys of an object, caller must read or skip each value
+        self._expect('{')
+        if self._peek() == 0x7D:
+            self._pos += 1
+            return
+        while True:
+            self._expect('"')
+            key = self._string()
+            self._expect(':')
+            yield key
+            c = self._next()
+            if c == 0x7D:
+                return
+            if c != 0x2C:
+                raise ValueError('syntax error in JSON: expected , or }')
+
+    def items(self): # iterate the elements of an array, caller must read or skip each value
+        self._expect('[')
+        if self._peek() == 0x5D:
+            self._pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            c = self._next()
+            if c == 0x5D:
+                return
+            if c != 0x2C:
+                raise ValueError('syntax error in JSON: expected , or ]')
+
+    def extract_value(self): # read the next value if it is a string or a scalar, skip it otherwise
+        c = self._peek()
+        if c == 0x7B or c == 0x5B:
+            self.skip()
+            return None
+        self._pos += 1
+        if c == 0x22:
+            return self._string()
+        return self._scalar(c)
+
+    def extract(self, path, fields, prefixes, out): # read the next value, keeping only the wanted fields
+        c = self._peek()
+        if c == 0x7B:
+            children = self.members()
+        elif c == 0x5B:
+            children = self.items()
+        else:
+            self._pos += 1
+            if c == 0x22:
+                value = self._string(path in fields)
+            else:
+                value = self._scalar(c)
+            if path in fields:
+                out[path] = value
+            return
+        for child in children:
+            sub = path + (child,)
+            if sub in fields or sub in prefixes:
+                self.extract(sub, fields, prefixes, out)
+            else:
+                self.skip()
+
+
+def _record(out, fields):
+    return tuple(out.get(path) for path in fields)
+
+
+def _require(out, required, document): # a 200 reply may still lack a field, e.g. a partial answer of the API
+    for path in required:
+        if out.get(path) is None:
+            raise ValueError(document + ' document has no ' + '.'.join(str(part) for part in path))
+
+
+def parse_current(stream, fields=CURRENT_FIELDS, required=CURRENT_REQUIRED): # return wanted fields of the whole document as a tuple
+    out = {}
+    stream.extract((), set(fields), _prefixes(fields), out)
+    _require(out, required, 'current weather')
+    return _record(out, fields)
+
+
+def parse_forecast(stream, count, fields=FORECAST_FIELDS, required=FORECAST_REQUIRED): # yield wanted fields of the first count 'list' items, ValueError if there are fewer
+    wanted = set(fields)
+    prefixes = _prefixes(fields)
+    found = 0
+    for key in stream.members():
+        if key != 'list':
+            stream.skip()
+            continue
+        for _ in stream.items():
+            out = {}
+            stream.extract((), wanted, prefixes, out)
+            _require(out, required, 'forecast')
+            yield _record(out, fields)
+            found += 1
+            if found >= count:
+                return # rest of the document is never read
+        break
+    raise ValueError('forecast document has {} of {} list items'.format(found, count)) # error reply such as {"cod":429,...}
+
+
+def parse_onecall(stream, count, step=3): # return (current, forecasts, timezone_offset), hourly items grouped by step like FORECAST_FIELDS, ValueError if current is missing
+    current = None
+    timezone_offset = None
+    forecasts = []
+    wanted = set(ONECALL_HOURLY_FIELDS)
+    prefixes = _prefixes(ONECALL_HOURLY_FIELDS)
+    for key in stream.members():
+        if key == 'timezone_offset': # before 'current' in the document
+            timezone_offset = stream.extract_value()
+        elif key == 'current':
+            out = {}
+            stream.extract((), set(ONECALL_CURRENT_FIELDS), _prefixes(ONECALL_CURRENT_FIELDS), out)
+            _require(out, ONECALL_CURRENT_REQUIRED, 'One Call current')
+            current = _record(out, ONECALL_CURRENT_FIELDS)
+        elif key == 'hourly':
+            group = None
+            for index in stream.items():
+                if len(forecasts) >= count:
+                    if current is not None:
+                        return current, forecasts, timezone_offset # rest of the document is never read
+                    stream.skip()
+                    continue
+                out = {}
+                stream.extract((), wanted, prefixes, out)
+                _require(out, ONECALL_HOURLY_REQUIRED, 'One Call hourly')
+                hour = _record(out, ONECALL_HOURLY_FIELDS)
+                if index % step == 0: # slot starts, other values are taken from its first hour
+                    if group is not None:
+                        forecasts.append(tuple(group))
+                    group = list(hour)
+                elif hour[4] is not None: # rain accumulated over the slot
+                    group[4] = (group[4] or 0) + hour[4]
+            if group is not None and len(forecasts) < count:
+                forecasts.append(tuple(group))
+        else:
+            stream.skip()
+    if current is None: # error reply
+        raise ValueError('One Call document has no current')
+    return current, forecasts, timezone_offset
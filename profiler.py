@@ -0,0 +1,72 @@
+''' Per-phase timing and heap profiler.
+start(phase) / stop(phase) record the elapsed milliseconds and the heap allocated in between into a ring buffer
+allocated once. With supervisor.ticks_ms (CircuitPython 7 and later) the hooks allocate nothing. CircuitPython 6 has
+no integer tick counter: time.monotonic_ns() allocates a long int per hook, read outside of the measured heap.
+report() prints min/mean/max per phase on demand.
+Guard the hooks with a micropython const (`if PROFILE:`) and the compiler drops them when it is False.
+'''
+
+import array
+import gc
+import time
+
+try:
+    from supervisor import ticks_ms as _ticks # small int, a float from time.monotonic() would be allocated
+    TICKS_MASK = (1 << 29) - 1 # ticks_ms wraps around
+except ImportError: # CircuitPython 6 and CPython. Integer math: a float monotonic() loses the milliseconds after hours of uptime
+    def _ticks():
+        return time.monotonic_ns() // 1000000
+    TICKS_MASK = -1
+
+
+class Profiler:
+    def __init__(self, phases, size=128):
+        self.phases = phases # phase names, phase ids are their indexes
+        self.size = size
+        self.samples = 0 # recorded since boot, the ring keeps the last size of them
+        self.heap_peak = 0 # highest gc.mem_alloc() seen by the hooks
+        self._started = array.array('l', [0] * len(phases)) # ticks at start() of each phase
+        self._free = array.array('l', [0] * len(phases)) # gc.mem_free() at start() of each phase
+        self._phase = bytearray(size)
+        self._ms = array.array('l', [0] * size)
+        self._alloc = array.array('l', [0] * size) # bytes, negative when a collection ran during the phase
+        self._next = 0
+
+    def start(self, phase): # ticks read before the heap, stop() reads them after it: what _ticks() allocates is not measured
+        self._started[phase] = _ticks()
+        self._free[phase] = gc.mem_free()
+
+    def stop(self, phase): # a phase that raised before stop() is simply not recorded
+        free = gc.mem_free()
+        elapsed = (_ticks() - self._started[phase]) & TICKS_MASK
+        i = self._next
+        self._phase[i] = phase
+        self._ms[i] = elapsed
+        self._alloc[i] = self._free[phase] - free
+        self._next = i + 1 if i + 1 < self.size else 0
+        self.samples += 1
+        used = gc.mem_alloc()
+        if used > self.heap_peak:
+            self.heap_peak = used
+
+    def report(self): # one line per phase seen in the ring: count, ms and bytes min/mean/max
+        count = min(self.samples, self.size)
+        print('PROFILE last {} of {} samples | heap high water: {:,} bytes'.format(count, self.samples, self.heap_peak))
+        for phase in range(len(self.phases)):
+            n = 0
+            for i in range(count):
+                if self._phase[i] != phase:
+                    continue
+                (ms, alloc) = (self._ms[i], self._alloc[i])
+                if n == 0:
+                    (ms_min, ms_max, ms_sum, alloc_min, alloc_max, alloc_sum) = (ms, ms, 0, alloc, alloc, 0)
+                n += 1
+                ms_sum += ms
+                alloc_sum += alloc
+                ms_min = min(ms_min, ms)
+                ms_max = max(ms_max, ms)
+                alloc_min = min(alloc_min, alloc)
+                alloc_max = max(alloc_max, alloc)
+            if n:
+                print('{:15s} {:4d} x {:5d}/{:5.0f}/{:5d} ms {:7,}/{:7,.0f}/{:7,} B'.format(
+                    self.phases[phase], n, ms_min, ms_sum / n, ms_max, alloc_min, alloc_sum / n, alloc_max))
@@ -0,0 +1,54 @@
+''' Retry policy with exponential backoff and jitter for the network updates.
+All endpoints share one RetryBudget so an outage cannot turn into a storm of retries.
+Retries are returned as delays for the scheduler, nothing here sleeps.
+'''
+
+import time
+import random
+
+
+class RetryBudget:
+    ''' Token bucket shared by all endpoints, every retry takes one token and one token comes back every refill_period seconds. '''
+
+    def __init__(self, capacity, refill_period):
+        self.capacity = capacity
+        self.refill_period = refill_period
+        self.tokens = capacity
+        self._last = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) / self.refill_period)
+        self._last = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class RetryPolicy:
+    ''' Backoff state of one endpoint. Delays double from base_delay up to max_delay, +/- jitter. '''
+
+    def __init__(self, name, budget, base_delay, max_delay, jitter=0.25):
+        self.name = name
+        self.budget = budget
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.failures = 0 # consecutive failures, the data of this endpoint is stale while > 0
+        self.total_failures = 0
+
+    @property
+    def stale(self):
+        return self.failures > 0
+
+    def success(self):
+        self.failures = 0
+
+    def failure(self, period): # seconds until the next attempt, period when the shared budget is spent
+        self.failures += 1
+        self.total_failures += 1
+        if not self.budget.take():
+            return period
+        delay = min(self.max_delay, self.base_delay * 2 ** (self.failures - 1))
+        return delay * (1 + self.jitter * (2 * random.random() - 1))
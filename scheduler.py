@@ -0,0 +1,72 @@
+''' Deadline driven scheduler for the station periodic tasks.
+Each task has its own period, the loop sleeps until the nearest deadline instead of polling.
+'''
+
+import time
+
+
+class Task:
+    ''' A periodic task. The callback may return the number of seconds until its next run to override the period. '''
+
+    def __init__(self, name, period, callback):
+        self.name = name
+        self.period = period
+        self.callback = callback
+        self.deadline = 0 # time.monotonic() value at which the task is due, 0 = as soon as possible
+        self.last_run = None # time.monotonic() of the last run
+        self.runs = 0
+        self.last_duration = 0 # seconds spent in the last run
+        self.lateness = 0 # seconds between deadline and start of the last run
+        self.max_lateness = 0
+
+    def run(self, now):
+        self.lateness = max(0, now - self.deadline) if self.deadline else 0
+        self.max_lateness = max(self.max_lateness, self.lateness)
+        self.last_run = now
+        delay = self.callback()
+        end = time.monotonic()
+        self.last_duration = end - now
+        self.runs += 1
+        if delay is None:
+            delay = self.period
+        self.deadline = max(now + delay, end) # never catch up with a burst of late runs
+
+
+class Scheduler:
+    def __init__(self):
+        self.tasks = []
+        self.ticks = 0 # run_pending() passes, the tasks run by one pass share a tick
+
+    def add(self, name, period, callback, delay=0): # tasks with the same deadline run in the order they were added
+        task = Task(name, period, callback)
+        if delay > 0: # first run in delay seconds instead of right away
+            task.deadline = time.monotonic() + delay
+        self.tasks.append(task)
+        return task
+
+    def next_deadline(self):
+        return min(task.deadline for task in self.tasks)
+
+    def run_pending(self): # run every task that is due, earliest deadline first
+        self.ticks += 1
+        while True:
+            now = time.monotonic()
+            due = None
+            for task in self.tasks:
+                if task.deadline <= now and (due is None or task.deadline < due.deadline):
+                    due = task
+            if due is None:
+                return
+            due.run(now)
+
+    def sleep(self, limit=None): # sleep exactly until the nearest deadline, limit seconds at most
+        delay = self.next_deadline() - time.monotonic()
+        if limit is not None:
+            delay = min(delay, limit)
+        if delay > 0:
+            time.sleep(delay)
+
+    def report(self): # one line per task: runs, last duration and lateness
+        for task in self.tasks:
+            print('{:16s} runs: {:6d} | last: {:6.2f}s | late: {:6.2f}s (max {:6.2f}s)'.format(
+                task.name, task.runs, task.last_duration, task.lateness, task.max_lateness))
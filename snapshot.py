@@ -0,0 +1,130 @@
+''' Binary snapshot of the last known state, for warm restarts without any request.
+Fixed layout: HEADER, STATE, then every ForecastSeries column at full capacity, all little endian struct packed.
+Written to a temporary file then renamed over the old one, read back with a single readinto().
+'''
+
+import os
+import struct
+from forecast import COLUMNS, METRICS
+
+MAGIC = b'WST1'
+HEADER = '<4sHH' # magic, forecast slots in use, checksum of everything after the header
+STATE = '<IIIiIIhBHBII32s32s'
+# current_fetched, forecast_fetched, time_synced: UTC seconds of the last success, 0 = never
+# utc_offset, sunrise, sunset
+# temp x10, humidity, wind x10, has_current
+# forecast expires, forecast size, forecast ETag, forecast Last-Modified
+_TYPECODES = {'utc': 'l', 'icon': 'B'}
+for _metric in METRICS:
+    _TYPECODES[_metric] = METRICS[_metric][0]
+
+
+def _checksum(buf, start): # 16 bit sum, catches a truncated or half written file
+    total = 0
+    for i in range(start, len(buf)):
+        total += buf[i]
+    return total & 0xFFFF
+
+
+def _field(value): # str to a 32s field, validators that do not fit are dropped (the next request is a plain download)
+    value = bytes(value or '', 'utf-8')
+    return value if len(value) <= 32 else b''
+
+
+def _text(value): # 32s field back to str, None if empty
+    value = bytes(value).rstrip(b'\0')
+    return str(value, 'utf-8') if value else None
+
+
+class Snapshot:
+    ''' State fields are plain attributes, set them then save(series). load(series) fills them back. '''
+
+    def __init__(self, path, capacity):
+        self.path = path
+        self.capacity = capacity
+        self.size = struct.calcsize(HEADER) + struct.calcsize(STATE) + sum(struct.calcsize('<' + _TYPECODES[name]) for name in COLUMNS) * capacity
+        self._buf = bytearray(self.size) # packed once per save, read into once per boot
+        self._written = bytearray(self.size) # last content on the card, unchanged states are not written again
+        self.writes = 0
+        self.skipped = 0
+        self.current_fetched = 0
+        self.forecast_fetched = 0
+        self.time_synced = 0
+        self.utc_offset = 0
+        self.sunrise = 0
+        self.sunset = 0
+        self.current = None # (temp, humidity, wind)
+        self.forecast_cache = None # (etag, last_modified, expires, size) of the forecast response, see ResponseCache.entry()
+
+    def _pack(self, series):
+        buf = self._buf
+        offset = struct.calcsize(HEADER)
+        current = self.current is not None and None not in self.current # a partial reading is not kept
+        (temp, humidity, wind) = self.current if current else (0, 0, 0)
+        (etag, last_modified, expires, size) = self.forecast_cache or (None, None, 0, 0)
+        struct.pack_into(STATE, buf, offset, self.current_fetched, self.forecast_fetched, self.time_synced,
+            self.utc_offset, self.sunrise, self.sunset, round(temp * 10), round(humidity), round(wind * 10), current,
+            expires or 0, size, _field(etag), _field(last_modified))
+        offset += struct.calcsize(STATE)
+        for name in COLUMNS:
+            column = getattr(series, name)
+            fmt = '<' + _TYPECODES[name]
+            step = struct.calcsize(fmt)
+            for slot in range(self.capacity):
+                struct.pack_into(fmt, buf, offset, column[slot] if slot < series.count else 0)
+                offset += step
+        struct.pack_into(HEADER, buf, 0, MAGIC, series.count, _checksum(buf, struct.calcsize(HEADER)))
+
+    def save(self, series): # True if written, False if the state did not change since the last write
+        self._pack(series)
+        if self._buf == self._written:
+            self.skipped += 1
+            return False
+        temp = self.path + '.tmp'
+        with open(temp, 'wb') as file:
+            file.write(self._buf)
+        try: # FAT cannot rename over a file, load() falls back to the temporary file in between
+            os.remove(self.path)
+        except OSError:
+            pass
+        os.rename(temp, self.path)
+        self._written[:] = self._buf
+        self.writes += 1
+        return True
+
+    def load(self, series): # True if a valid snapshot was read into the attributes and series
+        for path in (self.path, self.path + '.tmp'):
+            try:
+                with open(path, 'rb') as file:
+                    read = file.readinto(self._buf)
+            except OSError:
+                continue
+            if read == self.size and self._unpack(series):
+                self._written[:] = self._buf
+                return True
+        return False
+
+    def _unpack(self, series):
+        buf = self._buf
+        (magic, count, checksum) = struct.unpack_from(HEADER, buf, 0)
+        if magic != MAGIC or count > self.capacity or checksum != _checksum(buf, struct.calcsize(HEADER)):
+            return False
+        offset = struct.calcsize(HEADER)
+        (self.current_fetched, self.forecast_fetched, self.time_synced, self.utc_offset, self.sunrise, self.sunset,
+            temp, humidity, wind, has_current, expires, size, etag, last_modified) = struct.unpack_from(STATE, buf, offset)
+        self.current = (temp / 10, humidity, wind / 10) if has_current else None
+        self.forecast_cache = (_text(etag), _text(last_modified), expires, size) if expires else None
+        offset += struct.calcsize(STATE)
+        for name in COLUMNS:
+            column = getattr(series, name)
+            fmt = '<' + _TYPECODES[name]
+            step = struct.calcsize(fmt)
+            for slot in range(self.capacity):
+                if slot < count:
+                    column[slot] = struct.unpack_from(fmt, buf, offset)[0]
+                offset += step
+        series.count = count
+        return True
+
+    def report(self):
+        print('Snapshot {}: {} bytes | writes: {} | unchanged, not written: {}'.format(self.path, self.size, self.writes, self.skipped))
@@ -0,0 +1,112 @@
+''' Wall clock time sources, cheapest first.
+Every source returns UTC seconds since epoch, the local time is derived from the configured offset by the caller.
+'''
+
+import time
+from http_cache import header
+
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def epoch(year, month, day, hours, minutes, seconds): # UTC seconds since 1970, independent of the board timezone
+    if month <= 2:
+        year -= 1
+    era = year // 400
+    yoe = year - era * 400
+    doy = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    days = era * 146097 + doe - 719468
+    return days * 86400 + hours * 3600 + minutes * 60 + seconds
+
+
+class HeaderTimeSource:
+    ''' Date header of HTTP responses fetched anyway (e.g. 'Sun, 13 Sep 2020 05:05:12 GMT'), no extra request. '''
+    name = 'Date header'
+    needs_network = False
+
+    def __init__(self, max_age):
+        self.max_age = max_age # seconds a header stays usable, the monotonic clock drifts after that
+        self._utc = None
+        self._seen = None
+
+    def observe(self, headers): # call with the headers of every response
+        date = header(headers, 'Date')
+        if not date:
+            return
+        try:
+            (_, day, month, year, clock, _) = date.split(' ')
+            (hours, minutes, seconds) = [int(x) for x in clock.split(':')]
+            self._utc = epoch(int(year), _MONTHS.index(month) + 1, int(day), hours, minutes, seconds)
+            self._seen = time.monotonic()
+        except ValueError:
+            print('Unexpected Date header: ', date)
+
+    def utc(self):
+        if self._seen is None or time.monotonic() - self._seen > self.max_age:
+            raise RuntimeError('No recent Date header')
+        return self._utc + int(time.monotonic() - self._seen)
+
+
+class NtpTimeSource:
+    ''' NTP time kept by the ESP32 coprocessor. '''
+    name = 'ESP32 NTP'
+    needs_network = True
+
+    def __init__(self, esp):
+        self.esp = esp
+
+    def utc(self):
+        now = self.esp.get_time() # raises ValueError until the ESP32 got an NTP answer
+        if isinstance(now, tuple): # older nina-fw return (seconds, fraction)
+            now = now[0]
+        return now
+
+
+class AdafruitIOTimeSource:
+    ''' Adafruit IO strftime service, needs a TLS request. url must ask for the '%Y-%m-%d %H:%M:%S.%L %j %u %z' format. '''
+    name = 'Adafruit IO'
+    needs_network = True
+
+    def __init__(self, requests, url):
+        self.requests = requests
+        self.url = url
+
+    def utc(self):
+        response = self.requests.get(self.url, timeout=10)
+        try:
+            text = response.text
+        finally:
+            response.close()
+        print('Time reply: ', text, '\n')
+        times = text.split(' ')
+        year, month, mday = [int(x) for x in times[0].split('-')]
+        hours, minutes, seconds = [int(x) for x in times[1].split('.')[0].split(':')]
+        offset = times[4] # +0900
+        offset = (1 if offset[0] == '+' else -1) * (int(offset[1:3]) * 3600 + int(offset[3:5]) * 60)
+        return epoch(year, month, mday, hours, minutes, seconds) - offset
+
+
+class TimeKeeper:
+    ''' Tries the sources in order and returns the first answer. '''
+
+    def __init__(self, sources):
+        self.sources = sources
+        self.counts = {} # source name -> number of times it set the clock
+
+    def utc(self, connect=None): # (source name, UTC seconds), connect() is called before the first network source
+        errors = []
+        for source in self.sources:
+            if source.needs_network and connect:
+                connect()
+                connect = None
+            try:
+                utc = source.utc()
+            except Exception as error:
+                errors.append(source.name + ': ' + str(error))
+                continue
+            self.counts[source.name] = self.counts.get(source.name, 0) + 1
+            return source.name, utc
+        raise RuntimeError('No time source answered. ' + ' | '.join(errors))
+
+    def report(self):
+        print('TIME set by: ' + (' '.join('{}={}'.format(name, count) for name, count in self.counts.items()) or 'nothing yet'))
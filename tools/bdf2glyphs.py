@@ -0,0 +1,76 @@
+''' Converts BDF fonts to the compact glyph files read by glyph_font.py, keeping only the characters the station prints.
+Run on a computer from the repository root: python3 -m tools.bdf2glyphs fonts/mono-bold-8.bdf fonts/Arial-Bold-24.bdf
+Each font.bdf gives a font.glf next to it, copy them to CIRCUITPY/fonts. code_v3.py uses them when they are there.
+'''
+
+import argparse
+import os
+import struct
+from glyph_font import MAGIC, HEADER, GLYPH, STATION_CHARACTERS
+
+
+def read_bdf(path, code_points): # (bounding box, {code point: (width, height, dx, dy, shift_x, shift_y, rows)})
+    box = None
+    glyphs = {}
+    with open(path) as file:
+        lines = iter(file.read().splitlines())
+    for line in lines:
+        words = line.split()
+        if not words:
+            continue
+        if words[0] == 'FONTBOUNDINGBOX':
+            box = tuple(int(word) for word in words[1:5])
+        elif words[0] == 'STARTCHAR':
+            code_point = None
+            shift = (0, 0)
+            for line in lines:
+                words = line.split()
+                if words[0] == 'ENCODING':
+                    code_point = int(words[1])
+                elif words[0] == 'DWIDTH':
+                    shift = (int(words[1]), int(words[2]))
+                elif words[0] == 'BBX':
+                    (width, height, dx, dy) = (int(word) for word in words[1:5])
+                elif words[0] == 'BITMAP':
+                    row_bytes = (width + 7) // 8
+                    rows = [bytes.fromhex(next(lines).strip())[:row_bytes].ljust(row_bytes, b'\0') for _ in range(height)]
+                elif words[0] == 'ENDCHAR':
+                    break
+            if code_point in code_points:
+                glyphs[code_point] = (width, height, dx, dy, shift[0], shift[1], b''.join(rows))
+    if box is None:
+        raise ValueError('No FONTBOUNDINGBOX in ' + path)
+    return box, glyphs
+
+
+def write_glyphs(path, box, glyphs):
+    records = []
+    data = bytearray()
+    for code_point in sorted(glyphs):
+        (width, height, dx, dy, shift_x, shift_y, rows) = glyphs[code_point]
+        records.append(struct.pack(GLYPH, code_point, width, height, dx, dy, shift_x, shift_y, len(data)))
+        data += rows
+    with open(path, 'wb') as file:
+        file.write(struct.pack(HEADER, MAGIC, len(glyphs), *box))
+        file.write(b''.join(records))
+        file.write(data)
+    return struct.calcsize(HEADER) + len(records) * struct.calcsize(GLYPH) + len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('fonts', nargs='+', help='BDF files')
+    parser.add_argument('--chars', default=STATION_CHARACTERS, help='characters to keep')
+    args = parser.parse_args()
+    code_points = set(ord(char) for char in args.chars)
+    for bdf in args.fonts:
+        box, glyphs = read_bdf(bdf, code_points)
+        missing = ''.join(sorted(chr(code_point) for code_point in code_points - set(glyphs)))
+        glf = os.path.splitext(bdf)[0] + '.glf'
+        size = write_glyphs(glf, box, glyphs)
+        print('{}: {} glyphs, {:,} bytes (BDF {:,} bytes){}'.format(
+            glf, len(glyphs), size, os.path.getsize(bdf), ' missing: ' + repr(missing) if missing else ''))
+
+
+if __name__ == '__main__':
+    main()